@@ -1,6 +1,8 @@
 import requests, os
 from bs4 import BeautifulSoup
 from typing import List
+from http_cache import ResponseCache
+import settings
 
 class FileManager:
     _instance = None
@@ -24,7 +26,7 @@ class FileManager:
 class ParserFactory:
     @staticmethod
     def create_parser(url: str):
-        if "mse.mk" in url:
+        if "mse.mk" in url or url.startswith(settings.MSE_BASE_URL):
             return MacedonianStockExchangeParser()
         raise ValueError(f"No parser available for URL: {url}")
     
@@ -50,9 +52,10 @@ class StockDataFetcher:
         raise NotImplementedError("Subclasses must implement the `fetch_and_store` method.")
     
 class ValidCompanyFetcher(StockDataFetcher):
-    def fetch_and_store(self, url: str = 'https://www.mse.mk/en/stats/symbolhistory/KMB') -> List[str]:
+    def fetch_and_store(self, url: str = None) -> List[str]:
+        url = url or f"{settings.MSE_BASE_URL}/en/stats/symbolhistory/KMB"
         try:
-            response = requests.get(url)
+            response = ResponseCache().request(requests, "GET", url)
             response.raise_for_status()
 
             raw_html = response.text
@@ -1,18 +1,8 @@
-from pymongo import MongoClient
 from datetime import datetime, timedelta
 from typing import List
-
-class MongoDBConnection:
-    _instance = None
-
-    def __new__(cls, db_url: str = "mongodb://mongo:27017/"):
-        if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance.client = MongoClient(db_url)
-        return cls._instance
-
-    def get_database(self, db_name: str):
-        return self.client[db_name]
+from repository import MongoRepository
+from watermarks import WatermarkStore
+import settings
 
 
 class DateParser:
@@ -22,7 +12,7 @@ class DateParser:
 
 class DefaultDateParser(DateParser):
     def parse(self, date_str: str) -> datetime:
-        return datetime.strptime(date_str.strip(), '%d.%m.%Y')
+        return datetime.strptime(date_str.strip(), '%Y-%m-%d')
 
 
 class DateParserFactory:
@@ -32,9 +22,9 @@ class DateParserFactory:
 
 
 class LastDateFetcher:
-    def __init__(self, db, collection_name: str = "stock_data"):
-        self.collection = db[collection_name]
-        self.default_date = datetime.now() - timedelta(days=365 * 10)
+    def __init__(self, db, collection_name: str = None):
+        self.watermarks = WatermarkStore(db, data_collection_name=collection_name)
+        self.default_date = settings.as_of_date() - timedelta(days=365 * 10)
 
     def get_last_dates(self, stock_codes: List[str]) -> List[dict]:
         raise NotImplementedError("Subclasses must implement the `get_last_dates` method.")
@@ -42,16 +32,7 @@ class LastDateFetcher:
 
 class StockDateFetcher(LastDateFetcher):
     def get_last_dates(self, stock_codes: List[str]) -> List[dict]:
-        pipeline = [
-            {"$match": {"stock_code": {"$in": stock_codes}}},
-            {"$sort": {"timestamp": -1}},
-            {"$group": {
-                "_id": "$stock_code",
-                "last_date": {"$first": "$date"}
-            }}
-        ]
-        results = list(self.collection.aggregate(pipeline))
-        stock_dates = {result["_id"]: result["last_date"] for result in results}
+        stock_dates = self.watermarks.get_many(stock_codes)
 
         parser = DateParserFactory.create_parser()
 
@@ -60,18 +41,22 @@ class StockDateFetcher(LastDateFetcher):
             last_date = stock_dates.get(stock_code)
             if last_date:
                 last_date_parsed = parser.parse(last_date)
+                # The last stored day is fetched again: an intraday poll may have stored a partial bar for it,
+                # and the upserts replace it with the final one
+                from_date = last_date_parsed
             else:
                 last_date_parsed = self.default_date
+                from_date = self.default_date
             date_for_stocks.append({
                 "stock_code": stock_code,
-                "last_date": last_date_parsed.strftime('%Y-%m-%d')
+                "last_date": last_date_parsed.strftime('%Y-%m-%d'),
+                "from_date": from_date.strftime('%Y-%m-%d')
             })
         return date_for_stocks
 
 
 def check_and_get_dates(stock_codes: List[str]) -> List[dict]:
-    connection = MongoDBConnection()
-    db = connection.get_database("stock_data_db")
+    db = MongoRepository().database()
     fetcher = StockDateFetcher(db)
     return fetcher.get_last_dates(stock_codes)
 
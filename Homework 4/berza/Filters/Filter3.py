@@ -1,24 +1,29 @@
 import asyncio
+import time
 import aiohttp
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from typing import List
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from typing import Awaitable, Callable, List, Optional, Tuple
 from aiohttp import TCPConnector
-
-
-# Singleton Pattern for MongoDB Connection
-class MongoDBConnection:
-    _instance = None
-
-    def __new__(cls, mongo_uri="mongodb://mongo:27017/"):
-        if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance.client = MongoClient(mongo_uri)
-        return cls._instance
-
-    def get_database(self, db_name: str):
-        return self.client[db_name]
+from concurrent.futures import Executor, ProcessPoolExecutor
+from http_cache import CacheMissError, ResponseCache
+from metrics import PipelineMetrics
+from rate_limiter import RateController
+from row_batches import RowBatch, parse_batch
+from checkpoint import CheckpointStore
+from column_store import ColumnStore
+from events import EventBus
+from frame_cache import DataVersions
+from fetched_ranges import FetchedRangeStore
+from Predictors.indicator_state import IndicatorStateStore
+from repository import MongoRepository
+from rollups import RollupStore
+from timeseries import TimeSeriesWriter
+from watermarks import WatermarkStore
+import schema
+import settings
 
 
 # Strategy Pattern for Price Formatting
@@ -49,119 +54,479 @@ class PriceFormatterFactory:
 
 # Template Method Pattern for Data Fetching and Storing
 class DataFetcher:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, max_concurrency: int = 10):
         self.base_url = base_url
+        self.max_concurrency = max_concurrency
         self.price_formatter = PriceFormatterFactory.create_formatter()
 
-    async def fetch_data(self, session, company_name: str, start_date: str, end_date: str) -> List[dict]:
+    async def fetch_data(self, session, company_name: str, start_date: str, end_date: str,
+                         on_batch: Callable[[RowBatch], Awaitable[None]] = None) -> Optional[RowBatch]:
         raise NotImplementedError("Subclasses must implement the `fetch_data` method.")
 
-    def process_row(self, row, company_name: str):
+    def process_row(self, cells: List[str], company_name: str):
         raise NotImplementedError("Subclasses must implement the `process_row` method.")
 
 
+WINDOW_MONTHS = (1, 2, 3, 4, 6, 12)
+
+
 class StockDataFetcher(DataFetcher):
-    def __init__(self, base_url: str):
-        super().__init__(base_url)
+    def __init__(self, base_url: str, max_concurrency: int = 10, target_rows_per_window: int = 120,
+                 min_window_days: int = 30, max_window_days: int = 365, parser_backend: str = "lxml",
+                 rate_controller: RateController = None, closed_after_days: int = 7):
+        super().__init__(base_url, max_concurrency)
+        self.response_cache = ResponseCache()
+        self.metrics = PipelineMetrics()
+        # Windows that ended this many days before the run are settled history and are cached as immutable
+        self.closed_after_days = closed_after_days
+        self.parser_backend = parser_backend
+        # Set by DataProcessor; when None the table is parsed on the event loop
+        self.parse_executor: Optional[Executor] = None
+        # Every symbol and window fetched through this instance shares one rate and concurrency budget
+        self.rate_controller = rate_controller or RateController(max_concurrency=max_concurrency)
+        self.max_concurrency = self.rate_controller.max_concurrency
+        self.target_rows_per_window = target_rows_per_window
+        self.min_window_days = min_window_days
+        self.max_window_days = max_window_days
+        self.row_density = {}
 
-    async def fetch_data(self, session, company_name: str, start_date: str, end_date: str, max_retries=5) -> List[dict]:
-        url = f"{self.base_url}/{company_name}"
+    def window_days(self, company_name: str) -> int:
+        density = self.row_density.get(company_name)
+        if not density:
+            return self.max_window_days
+        days = int(self.target_rows_per_window / density)
+        return min(self.max_window_days, max(self.min_window_days, days))
+
+    def learn_density(self, company_name: str, window: Tuple[datetime, datetime], row_count: int):
+        observed = row_count / ((window[1] - window[0]).days + 1)
+        previous = self.row_density.get(company_name)
+        self.row_density[company_name] = observed if previous is None else (previous + observed) / 2
+
+    @staticmethod
+    def uncovered_ranges(start_date: datetime, end_date: datetime,
+                         covered: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+        ranges = []
+        current = start_date
+        for covered_start, covered_end in sorted(covered):
+            if covered_end < current:
+                continue
+            if covered_start > end_date:
+                break
+            if covered_start > current:
+                ranges.append((current, covered_start - timedelta(days=1)))
+            current = max(current, covered_end + timedelta(days=1))
+        if current <= end_date:
+            ranges.append((current, end_date))
+        return ranges
+
+    @staticmethod
+    def window_months(window_days: int) -> int:
+        # Window lengths snap to calendar periods that divide the year: 1, 2, 3, 4, 6 or 12 months
+        months = max(1, round(window_days / 30.44))
+        return max(length for length in WINDOW_MONTHS if length <= months)
+
+    @staticmethod
+    def plan_windows(start_date: datetime, end_date: datetime, window_days: int) -> List[Tuple[datetime, datetime]]:
+        # Newest window first, so incremental runs and the probe request hit the most recent bars.
+        # Windows are whole calendar periods (clipped to the range), so a settled historical window has the same
+        # dates, and the same HTTP cache key, on every run instead of shifting with the end date.
+        months = StockDataFetcher.window_months(window_days)
+        windows = []
+        current_end = end_date
+        while current_end >= start_date:
+            period = (current_end.year * 12 + current_end.month - 1) // months * months
+            current_start = max(datetime(period // 12, period % 12 + 1, 1), start_date)
+            windows.append((current_start, current_end))
+            current_end = current_start - timedelta(days=1)
+        return windows
+
+    async def fetch_data(self, session, company_name: str, start_date: str, end_date: str, max_retries=5,
+                         on_batch: Callable[[RowBatch], Awaitable[None]] = None,
+                         on_window_done: Callable[[Tuple[datetime, datetime], RowBatch], Awaitable[None]] = None,
+                         completed: List[Tuple[datetime, datetime]] = None,
+                         window_days: int = None) -> Optional[RowBatch]:
+        # window_days pins the window size instead of the learned one, for callers that planned the windows already
         start_date = datetime.strptime(start_date, '%Y-%m-%d')
         end_date = datetime.strptime(end_date, '%Y-%m-%d')
+        # Windows finished by an interrupted run are cut out before planning
+        ranges = self.uncovered_ranges(start_date, end_date, completed or [])
+        if not ranges:
+            return RowBatch.empty(company_name)
+
+        async def fetch_window(window):
+            window_rows = await self.fetch_window(session, company_name, window, max_retries)
+            if window_rows is None:
+                return None
+            # Streaming mode hands every window to the writer instead of holding the whole history
+            if on_batch and window_rows:
+                await on_batch(window_rows)
+            if on_window_done:
+                await on_window_done(window, window_rows)
+            return RowBatch.empty(company_name) if on_batch else window_rows
+
+        # The probe window sizes the rest of the history from the rows it actually returned
+        probe = self.plan_windows(ranges[-1][0], ranges[-1][1], window_days or self.window_days(company_name))[0]
+        results = [await fetch_window(probe)]
+        if results[0] is None:
+            return None
+
+        ranges[-1] = (ranges[-1][0], probe[0] - timedelta(days=1))
+        remaining = [window for range_start, range_end in ranges
+                     for window in self.plan_windows(range_start, range_end,
+                                                     window_days or self.window_days(company_name))]
+        results.extend(await asyncio.gather(*[fetch_window(window) for window in remaining]))
+        if any(window_rows is None for window_rows in results):
+            return None
 
-        rows = []
-        current_start = start_date
+        return RowBatch.concat(company_name, results)
+
+    async def fetch_window(self, session, company_name: str, window: Tuple[datetime, datetime],
+                           max_retries=5) -> Optional[RowBatch]:
+        url = f"{self.base_url}/{company_name}"
+        params = {
+            "FromDate": window[0].strftime('%m/%d/%Y'),
+            "ToDate": window[1].strftime('%m/%d/%Y')
+        }
+
+        try:
+            entry = self.response_cache.lookup("GET", url, params)
+        except CacheMissError as e:
+            print(e)
+            return None
+        closed = window[1] < settings.as_of_date() - timedelta(days=self.closed_after_days)
 
-        while current_start < end_date:
-            current_end = min(current_start + timedelta(days=365), end_date)
-            params = {
-                "FromDate": current_start.strftime('%m/%d/%Y'),
-                "ToDate": current_end.strftime('%m/%d/%Y')
-            }
+        for attempt in range(max_retries):
+            if self.response_cache.serves_offline(entry):
+                html = entry.text
+                self.metrics.increment("cache_hits", symbol=company_name)
+            else:
+                html = await self.request_page(session, company_name, url, params, entry, closed)
 
-            retries = 0
-            while retries < max_retries:
+            if html is not None:
+                start_time = time.perf_counter()
+                window_rows = await self.parse(html, company_name)
+                elapsed = time.perf_counter() - start_time
+                self.metrics.add_stage_time("parse", elapsed)
+                self.metrics.observe("parse_seconds", elapsed)
+                self.metrics.increment("rows_parsed", len(window_rows), symbol=company_name)
+                self.learn_density(company_name, window, len(window_rows))
+                return window_rows
+
+            if attempt < max_retries - 1:
+                self.metrics.increment("retries", symbol=company_name)
+                wait_time = self.rate_controller.backoff_delay(attempt)
+                print(f"Request for {company_name} failed, retrying in {wait_time:.1f} seconds...")
+                await asyncio.sleep(wait_time)
+
+        print(f"Failed to fetch data for {company_name} after {max_retries} attempts.")
+        self.metrics.increment("failed_windows", symbol=company_name)
+        return None
+
+    async def request_page(self, session, company_name: str, url: str, params: dict, entry,
+                           closed: bool) -> Optional[str]:
+        try:
+            async with self.rate_controller.slot():
+                headers = self.response_cache.conditional_headers(entry)
+                start_time = time.perf_counter()
                 try:
-                    async with session.get(url, params=params) as response:
+                    async with session.get(url, params=params, headers=headers) as response:
                         if response.status == 503:
-                            retries += 1
-                            wait_time = 2
-                            print(f"503 error, retrying in {wait_time} seconds...")
-                            await asyncio.sleep(wait_time)
-                            continue
+                            self.rate_controller.on_throttle()
+                            self.metrics.increment("responses_503", symbol=company_name)
+                            return None
+                        if response.status == 304 and entry is not None:
+                            self.rate_controller.on_success()
+                            self.metrics.increment("not_modified", symbol=company_name)
+                            return entry.text
                         response.raise_for_status()
-                        html = await response.text()
-                        soup = BeautifulSoup(html, 'html.parser')
-                        table_body = soup.find('tbody')
-                        if table_body:
-                            rows_in_table = table_body.find_all('tr')
-                            for row in rows_in_table:
-                                row_data = self.process_row(row, company_name)
-                                if row_data:
-                                    rows.append(row_data)
-                        break
-                except aiohttp.ClientResponseError:
-                    if retries == max_retries - 1:
-                        print(f"Failed to fetch data for {company_name} after {max_retries} attempts.")
-                        return []
-                    retries += 1
-                    wait_time = 2
-                    print(f"Retrying in {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-            current_start = current_end + timedelta(days=1)
-
-        return rows
-
-    def process_row(self, row, company_name: str):
-        cells = row.find_all('td')
-        if not cells:
+                        content = await response.read()
+                        encoding = response.get_encoding()
+                        self.rate_controller.on_success()
+                        self.metrics.increment("bytes_downloaded", len(content), symbol=company_name)
+                        self.response_cache.save("GET", url, params, None, content, response.headers,
+                                                 immutable=closed, encoding=encoding)
+                        return content.decode(encoding, errors="replace")
+                finally:
+                    elapsed = time.perf_counter() - start_time
+                    self.metrics.add_stage_time("fetch", elapsed)
+                    self.metrics.observe("request_latency_seconds", elapsed)
+                    self.metrics.increment("requests", symbol=company_name)
+        except asyncio.TimeoutError:
+            self.rate_controller.on_throttle()
+            self.metrics.increment("timeouts", symbol=company_name)
+        except aiohttp.ClientError:
+            self.rate_controller.on_error()
+            self.metrics.increment("client_errors", symbol=company_name)
+        return None
+
+    async def parse(self, html: str, company_name: str) -> RowBatch:
+        # The whole table is converted column-wise; process_row remains the per-row reference implementation
+        if self.parse_executor is None:
+            return parse_batch(self.parser_backend, html, company_name)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parse_executor, parse_batch, self.parser_backend, html, company_name)
+
+    def process_row(self, cells: List[str], company_name: str):
+        if len(cells) < 9:
             return None
 
-        volume = int(cells[6].text.strip().replace(",", "") or 0)
+        volume = int(cells[6].replace(",", "") or 0)
         if volume == 0:
             return None
 
         return {
             "company_name": company_name,
-            "date": datetime.strptime(cells[0].text.strip(), "%m/%d/%Y").strftime("%Y-%m-%d"),
-            "last_trade_price": self.price_formatter.format(cells[1].text.strip()),
-            "max_price": self.price_formatter.format(cells[2].text.strip()),
-            "min_price": self.price_formatter.format(cells[3].text.strip()),
-            "avg_price": self.price_formatter.format(cells[4].text.strip()),
-            "percent_change": self.price_formatter.format(cells[5].text.strip()),
+            "date": datetime.strptime(cells[0], "%m/%d/%Y"),
+            "schema_version": schema.SCHEMA_VERSION,
+            "last_trade_price": self.price_formatter.format(cells[1]),
+            "max_price": self.price_formatter.format(cells[2]),
+            "min_price": self.price_formatter.format(cells[3]),
+            "avg_price": self.price_formatter.format(cells[4]),
+            "percent_change": self.price_formatter.format(cells[5]),
             "volume": volume,
-            "turnover": self.price_formatter.format(cells[7].text.strip()),
-            "total_turnover": self.price_formatter.format(cells[8].text.strip())
+            "turnover": self.price_formatter.format(cells[7]),
+            "total_turnover": self.price_formatter.format(cells[8])
         }
 
 
+# Idempotent Bulk Writer keyed on the unique (company_name, date) index
+class BulkUpsertWriter:
+    def __init__(self, mongo_collection):
+        self.collection = mongo_collection
+        self._indexed = False
+
+    def ensure_indexes(self):
+        if self._indexed:
+            return
+        keys = [("company_name", ASCENDING), ("date", ASCENDING)]
+        try:
+            self.collection.create_index(keys, unique=True, name="company_date_unique")
+        except OperationFailure:
+            # Earlier runs used insert_many and left duplicate bars behind
+            removed = self.remove_duplicates()
+            print(f"Removed {removed} duplicate records before building the unique index.")
+            self.collection.create_index(keys, unique=True, name="company_date_unique")
+        # Typed bars would not match legacy string dates on upsert, so old documents are converted first
+        legacy = schema.legacy_count(self.collection)
+        if legacy:
+            print(f"Migrating {legacy} legacy documents to schema v{schema.SCHEMA_VERSION} before writing.")
+            schema.migrate(self.collection)
+        self._indexed = True
+
+    def remove_duplicates(self) -> int:
+        pipeline = [
+            {"$group": {
+                "_id": {"company_name": "$company_name", "date": "$date"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        removed = 0
+        stock_codes = set()
+        for group in self.collection.aggregate(pipeline, allowDiskUse=True):
+            removed += self.collection.delete_many({"_id": {"$in": group["ids"][1:]}}).deleted_count
+            stock_codes.add(group["_id"]["company_name"])
+        DataVersions(MongoRepository()).bump_all(stock_codes)
+        return removed
+
+    def write(self, batch: RowBatch) -> int:
+        if not len(batch):
+            return 0
+        return MongoRepository().bulk_upsert(batch.to_documents(), self.collection)
+
+
+# Factory Pattern for the bar writer of the configured storage backend
+class BarWriterFactory:
+    @staticmethod
+    def create_writer(mongo_collection):
+        if settings.STOCK_DATA_BACKEND == "timeseries":
+            return TimeSeriesWriter(mongo_collection)
+        return BulkUpsertWriter(mongo_collection)
+
+
 # Asynchronous Processing and Storage Manager
 class DataProcessor:
-    def __init__(self, fetcher: DataFetcher, mongo_collection):
+    def __init__(self, fetcher: DataFetcher, mongo_collection, watermarks: WatermarkStore = None,
+                 streaming: bool = True, parse_workers: Optional[int] = None,
+                 checkpoints: CheckpointStore = None):
         self.fetcher = fetcher
-        self.collection = mongo_collection
+        self.checkpoints = checkpoints
+        self.run_id = None
+        self.completed_units = {}
+        self.parse_workers = parse_workers
+        self.writer = BarWriterFactory.create_writer(mongo_collection)
+        # Successfully fetched windows, so the gap scanner knows their days without a bar had no trades
+        self.fetched_ranges = FetchedRangeStore(mongo_collection.database)
+        # Everything derived from the stored bars is updated by subscribers of the ingest events
+        self.events = EventBus()
+        self.events.subscribe("rollups", RollupStore().on_bars_written)
+        if settings.COLUMN_STORE_ENABLED:
+            self.events.subscribe("column_store", ColumnStore().on_bars_written)
+        self.events.subscribe("indicator_state", IndicatorStateStore().on_bars_written)
+        self.watermarks = watermarks
+        self.streaming = streaming
+        self.metrics = PipelineMetrics()
+
+    @asynccontextmanager
+    async def open_session(self):
+        with self.metrics.stage("store"):
+            self.writer.ensure_indexes()
+        connector = TCPConnector(limit_per_host=self.fetcher.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=60)
+        # HTML parsing is CPU bound, so it runs on all cores while the event loop keeps downloading
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+            self.fetcher.parse_executor = executor
+            try:
+                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                    yield session
+            finally:
+                self.fetcher.parse_executor = None
+        rate_controller = getattr(self.fetcher, "rate_controller", None)
+        if rate_controller:
+            print(f"Rate controller: {rate_controller.snapshot()}")
+
+    async def process_and_store(self, companies_with_dates: List[dict], end_date: str = None,
+                                run_id: str = None) -> bool:
+        end_date = end_date or settings.as_of_date().strftime('%Y-%m-%d')
+        self.use_run(run_id)
+        async with self.open_session() as session:
+            return await self.store_companies(session, companies_with_dates, end_date)
+
+    def use_run(self, run_id: Optional[str]):
+        self.run_id = run_id
+        if self.checkpoints and run_id:
+            self.completed_units = self.checkpoints.completed_units(run_id)
+
+    async def store_companies(self, session, companies_with_dates: List[dict], end_date: str) -> bool:
+        # Any number of batches can go through one session; the scheduler feeds a whole cycle this way
+        if self.streaming:
+            results = await asyncio.gather(*[
+                self._fetch_and_stream(session, company, end_date) for company in companies_with_dates
+            ])
+            return all(results)
+
+        tasks = [
+            self.fetcher.fetch_data(session, company["stock_code"], self._from_date(company), end_date)
+            for company in companies_with_dates
+        ]
+        results = await asyncio.gather(*tasks)
+        for company, result in zip(companies_with_dates, results):
+            if result:
+                self._write(company["stock_code"], result)
+                print(f"Upserted {len(result)} records for {company['stock_code']} into MongoDB.")
+                self._advance_watermark(company["stock_code"], result.last_date())
+            if result is not None:
+                self._mark_fetched(company["stock_code"], (self._from_date(company), end_date))
+        return all(result is not None for result in results)
+
+    async def _fetch_and_stream(self, session, company: dict, end_date: str) -> bool:
+        stock_code = company["stock_code"]
+        completed_units = self.completed_units.get(stock_code, [])
+        completed = [(datetime.strptime(unit["from_date"], '%Y-%m-%d'), datetime.strptime(unit["to_date"], '%Y-%m-%d'))
+                     for unit in completed_units]
+        flushed_dates = [unit["last_date"] for unit in completed_units if unit.get("last_date")]
+        flush = self._flusher(stock_code, flushed_dates)
+
+        async def window_done(window: Tuple[datetime, datetime], rows: RowBatch):
+            await asyncio.to_thread(self._mark_fetched, stock_code, window)
+            if self.checkpoints and self.run_id:
+                last_date = rows.last_date() if len(rows) else None
+                await asyncio.to_thread(self.checkpoints.mark_done, self.run_id, stock_code,
+                                        window[0].strftime('%Y-%m-%d'), window[1].strftime('%Y-%m-%d'),
+                                        len(rows), last_date)
+
+        result = await self.fetcher.fetch_data(session, stock_code, self._from_date(company), end_date,
+                                               on_batch=flush, on_window_done=window_done, completed=completed)
+        # The watermark only moves once every window of the symbol has been stored
+        if result is not None and flushed_dates:
+            await asyncio.to_thread(self._advance_watermark, stock_code, max(flushed_dates))
+        return result is not None
 
-    async def process_and_store(self, companies_with_dates: List[dict]):
-        connector = TCPConnector(limit_per_host=10)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            tasks = [
-                self.fetcher.fetch_data(session, company["stock_code"], company["last_date"],
-                                        datetime.now().strftime('%Y-%m-%d'))
-                for company in companies_with_dates
-            ]
-            results = await asyncio.gather(*tasks)
-            for result in results:
-                if result:
-                    self.collection.insert_many(result)
-                    print(f"Inserted {len(result)} records into MongoDB.")
+    async def store_range(self, session, stock_code: str, from_date: str, end_date: str,
+                          window_days: int = None) -> Tuple[bool, Optional[str]]:
+        # Fetches and stores one date range without touching the watermark; returns (succeeded, last stored date)
+        flushed_dates = []
+
+        async def window_done(window: Tuple[datetime, datetime], rows: RowBatch):
+            await asyncio.to_thread(self._mark_fetched, stock_code, window)
+
+        result = await self.fetcher.fetch_data(session, stock_code, from_date, end_date,
+                                               on_batch=self._flusher(stock_code, flushed_dates),
+                                               on_window_done=window_done, window_days=window_days)
+        return result is not None, max(flushed_dates, default=None)
+
+    def _flusher(self, stock_code: str, flushed_dates: List[str]) -> Callable[[RowBatch], Awaitable[None]]:
+        async def flush(rows: RowBatch):
+            # pymongo is blocking, so the write runs in a worker thread while other downloads continue
+            await asyncio.to_thread(self._write, stock_code, rows)
+            flushed_dates.append(rows.last_date())
+            print(f"Upserted {len(rows)} records for {stock_code} into MongoDB.")
+        return flush
+
+    def _write(self, stock_code: str, rows: RowBatch):
+        # Runs in a worker thread in streaming mode; the elapsed time is time the symbol spent blocked on Mongo
+        start_time = time.perf_counter()
+        self.writer.write(rows)
+        elapsed = time.perf_counter() - start_time
+        self.metrics.add_stage_time("store", elapsed)
+        self.metrics.observe("mongo_write_seconds", elapsed)
+        self.metrics.increment("rows_written", len(rows), symbol=stock_code)
+        if len(rows):
+            with self.metrics.stage("post_write"):
+                self.events.publish(stock_code, rows.first_date(), rows.last_date(), len(rows), batch=rows)
+
+    def _mark_fetched(self, stock_code: str, window: Tuple):
+        from_date, to_date = (day if isinstance(day, str) else day.strftime('%Y-%m-%d') for day in window)
+        with self.metrics.stage("store"):
+            self.fetched_ranges.mark_fetched(stock_code, from_date, to_date)
+
+    def _advance_watermark(self, stock_code: str, last_date: str):
+        if self.watermarks:
+            with self.metrics.stage("store"):
+                self.watermarks.advance(stock_code, last_date)
+
+    @staticmethod
+    def _from_date(company: dict) -> str:
+        return company.get("from_date", company["last_date"])
 
 
 # Main Functionality
-async def fetch_and_store_data_for_stocks(companies_with_dates: List[dict]):
-    connection = MongoDBConnection()
-    db = connection.get_database("stocks_db")
-    collection = db["stock_data"]
-
-    fetcher = StockDataFetcher("https://www.mse.mk/en/stats/symbolhistory")
-    processor = DataProcessor(fetcher, collection)
-    await processor.process_and_store(companies_with_dates)
+def open_run(db, companies_with_dates: List[dict], resume: bool = False, scope: str = "ingest") -> dict:
+    checkpoints = CheckpointStore(db)
+    run = checkpoints.latest_unfinished_run(scope) if resume else None
+    if run:
+        # The original plan is reused, so the recorded windows line up with the ones still to fetch
+        print(f"Resuming run {run['_id']} started at {run['started_at']}.")
+        return checkpoints.claim(run)
+    if resume:
+        print("No interrupted run to resume; starting a new one.")
+    return checkpoints.start_run(companies_with_dates, settings.as_of_date().strftime('%Y-%m-%d'), scope)
+
+
+def create_processor(db, rate_controller: RateController = None, parse_workers: Optional[int] = None) -> DataProcessor:
+    fetcher = StockDataFetcher(f"{settings.MSE_BASE_URL}/en/stats/symbolhistory", rate_controller=rate_controller)
+    return DataProcessor(fetcher, db[settings.STOCK_DATA_COLLECTION], WatermarkStore(db), parse_workers=parse_workers,
+                         checkpoints=CheckpointStore(db))
+
+
+async def store_run_companies(db, companies_with_dates: List[dict], run: dict,
+                              rate_controller: RateController = None, parse_workers: Optional[int] = None) -> bool:
+    processor = create_processor(db, rate_controller, parse_workers)
+    return await processor.process_and_store(companies_with_dates, run["end_date"], run["_id"])
+
+
+def finish_run(db, run: dict, succeeded: bool):
+    if succeeded:
+        CheckpointStore(db).finish_run(run["_id"])
+    else:
+        print(f"Some windows failed; run {run['_id']} can be continued with --resume.")
+
+
+async def fetch_and_store_data_for_stocks(companies_with_dates: List[dict], resume: bool = False):
+    db = MongoRepository().database()
+
+    run = open_run(db, companies_with_dates, resume)
+    with CheckpointStore(db).keep_alive(run["_id"]):
+        succeeded = await store_run_companies(db, run["companies"], run)
+    finish_run(db, run, succeeded)
@@ -1,14 +1,29 @@
+import argparse
 import asyncio
+import os
+import sys
 import time
+
+# The shared modules (settings, http_cache, ...) live in the project root next to main_api.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from Filter1 import fetch_valid
 from Filter2 import check_and_get_dates
 from Filter3 import fetch_and_store_data_for_stocks
+from gaps import backfill_gaps
+from metrics import PipelineMetrics
+from leases import run_distributed
+from scheduler import IngestScheduler
+from sharding import run_sharded
 
 
-async def measure_scraping_time():
+async def measure_scraping_time(metrics_json: str = None, metrics_prom: str = None, resume: bool = False,
+                                shards: int = 1, distributed: bool = False, batch_id: str = None):
+    metrics = PipelineMetrics()
     try:
         print("Fetching valid stock codes...")
-        stock_codes = fetch_valid()
+        with metrics.stage("symbol_discovery"):
+            stock_codes = fetch_valid()
 
         if not stock_codes:
             print("No valid stock codes found. Exiting...")
@@ -17,14 +32,21 @@ async def measure_scraping_time():
         start_time = time.time()
 
         print("Fetching last available dates for stocks...")
-        stocks_with_dates = check_and_get_dates(stock_codes)
+        with metrics.stage("watermark_lookup"):
+            stocks_with_dates = check_and_get_dates(stock_codes)
 
         if not stocks_with_dates:
             print("No stock dates found. Exiting...")
             return
 
         print("Fetching and storing data for stocks...")
-        await fetch_and_store_data_for_stocks(stocks_with_dates)
+        with metrics.stage("fetch_and_store"):
+            if distributed:
+                await run_distributed(stocks_with_dates, batch_id)
+            elif shards > 1:
+                await asyncio.to_thread(run_sharded, stocks_with_dates, shards, resume)
+            else:
+                await fetch_and_store_data_for_stocks(stocks_with_dates, resume=resume)
 
         end_time = time.time()
         time_taken = end_time - start_time
@@ -32,10 +54,52 @@ async def measure_scraping_time():
 
     except Exception as e:
         print(f"An error occurred during the scraping process: {e}")
+    finally:
+        export_metrics(metrics, metrics_json, metrics_prom)
+
+
+def export_metrics(metrics: PipelineMetrics, metrics_json: str = None, metrics_prom: str = None):
+    snapshot = metrics.snapshot()
+    print("Time per stage (fetch, parse and store are summed over concurrent symbols):")
+    for stage, seconds in snapshot["stages_seconds"].items():
+        print(f"  {stage}: {seconds:.2f} seconds")
+    if metrics_json:
+        metrics.to_json(metrics_json)
+        print(f"Metrics written to {metrics_json}")
+    if metrics_prom:
+        metrics.to_prometheus(metrics_prom)
+        print(f"Prometheus metrics written to {metrics_prom}")
 
 
 def main():
-    asyncio.run(measure_scraping_time())
+    parser = argparse.ArgumentParser(description="Fetch and store MSE trading data for all valid stock codes.")
+    parser.add_argument("--metrics-json", help="Write pipeline metrics as JSON to this file")
+    parser.add_argument("--metrics-prom", help="Write pipeline metrics in Prometheus text format to this file")
+    parser.add_argument("--resume", action="store_true", help="Continue the last interrupted run")
+    parser.add_argument("--shards", type=int, default=1, help="Split the symbols across this many worker processes")
+    parser.add_argument("--distributed", action="store_true",
+                        help="Claim work units through MongoDB leases so several nodes can split the run")
+    parser.add_argument("--batch-id", help="Batch to create or join in distributed mode (default: the run date)")
+    parser.add_argument("--scan-gaps", action="store_true", help="Report missing trading days inside stored histories")
+    parser.add_argument("--backfill-gaps", action="store_true", help="Fetch only the windows covering missing trading days")
+    parser.add_argument("--since", help="Limit the gap scan to bars on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and refresh on a market-hours schedule")
+    parser.add_argument("--poll-minutes", type=int, default=30, help="Intraday polling interval in daemon mode")
+    parser.add_argument("--market-close", default="13:00", help="Session close (Europe/Skopje) in daemon mode")
+    args = parser.parse_args()
+
+    if args.scan_gaps or args.backfill_gaps:
+        metrics = PipelineMetrics()
+        with metrics.stage("backfill"):
+            asyncio.run(backfill_gaps(since=args.since, dry_run=not args.backfill_gaps))
+        export_metrics(metrics, args.metrics_json, args.metrics_prom)
+        return
+    if args.daemon:
+        scheduler = IngestScheduler(poll_interval_minutes=args.poll_minutes, market_close=args.market_close)
+        asyncio.run(scheduler.run_forever())
+        return
+    asyncio.run(measure_scraping_time(args.metrics_json, args.metrics_prom, args.resume, args.shards,
+                                      args.distributed, args.batch_id))
 
 
 if __name__ == "__main__":
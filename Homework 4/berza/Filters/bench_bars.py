@@ -0,0 +1,73 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+import pandas as pd
+
+# The shared modules (settings, schema, ...) live in the project root next to main_api.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository import MongoRepository
+import schema
+
+
+def read_bars(collection, stock_code: str, start: datetime = None) -> pd.DataFrame:
+    # Same shape of query as company_info (full history) and TechnicalAnalysis (two-year window)
+    query = {"company_name": stock_code, **schema.date_range_filter(start)}
+    return pd.DataFrame(list(collection.find(query, {"_id": 0})))
+
+
+def storage_stats(db, name: str) -> dict:
+    try:
+        stats = db.command("collStats", name)
+    except Exception as e:
+        return {"error": str(e)}
+    return {"documents": stats.get("count"), "size_mb": stats.get("size", 0) / 1024 / 1024,
+            "storage_mb": stats.get("storageSize", 0) / 1024 / 1024,
+            "index_mb": stats.get("totalIndexSize", 0) / 1024 / 1024}
+
+
+def bench_collection(collection, stock_codes: List[str], start: datetime, repeat: int) -> dict:
+    results = {}
+    for name, window_start in [("full_history", None), ("two_years", start)]:
+        timings, rows = [], 0
+        for _ in range(repeat):
+            for stock_code in stock_codes:
+                start_time = time.perf_counter()
+                rows += len(read_bars(collection, stock_code, window_start))
+                timings.append(time.perf_counter() - start_time)
+        timings.sort()
+        results[name] = {
+            "median_ms": statistics.median(timings) * 1000,
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+            "rows_per_sec": rows / sum(timings) if sum(timings) else 0.0
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bar reads from the plain and time-series collections.")
+    parser.add_argument("--collections", nargs="+", default=["stock_data", "stock_bars"])
+    parser.add_argument("--symbols", type=int, default=30, help="Number of symbols to read (most bars first)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    db = MongoRepository().database()
+    pipeline = [{"$group": {"_id": "$company_name", "bars": {"$sum": 1}}}, {"$sort": {"bars": -1}},
+                {"$limit": args.symbols}]
+    stock_codes = [result["_id"] for result in db[args.collections[0]].aggregate(pipeline)]
+    start = datetime.now() - timedelta(days=365 * 2)
+
+    print(f"Reading {len(stock_codes)} symbols x {args.repeat}")
+    for name in args.collections:
+        print(f"{name}: {storage_stats(db, name)}")
+        for query, result in bench_collection(db[name], stock_codes, start, args.repeat).items():
+            print(f"  {query:<13} median {result['median_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  "
+                  f"{result['rows_per_sec']:.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+# The shared modules (settings, schema, ...) live in the project root next to main_api.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bar_loader import ArrowBarLoader, RawBsonBarLoader, pa
+from column_store import ColumnStore, ColumnStoreLoader
+from repository import MongoRepository
+from row_batches import RowBatch
+from standin_server import StandInConfig, SymbolHistoryStore
+import schema
+import settings
+
+FIELDS = ["last_trade_price", "min_price", "max_price", "volume"]
+
+
+def load_with_cursor(repository: MongoRepository, stock_code: str) -> pd.DataFrame:
+    # The previous reader path: whole documents, one dict each, then a row-wise apply per column
+    df = pd.DataFrame(list(repository.bars_collection().find({"company_name": stock_code})))
+    df['date'] = pd.to_datetime(df['date'])
+    for column in FIELDS:
+        df[column] = df[column].apply(schema.to_number)
+    return df
+
+
+def seed_history(repository: MongoRepository, stock_code: str, years: int):
+    # A liquid symbol that traded every weekday for the whole period (the stand-in scales the probability by 0.1-1.5)
+    store = SymbolHistoryStore(StandInConfig(symbols=1, history_years=years, trade_probability=10.0))
+    cells = list(store.history(stock_code).values())
+    batch = RowBatch.from_cells(cells, stock_code)
+    repository.bulk_upsert(batch.to_documents())
+    print(f"Seeded {len(batch)} bars for {stock_code} into {settings.STOCK_DATA_COLLECTION}.")
+
+
+def bench(name: str, load, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        rows = len(load())
+        timings.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    arrow_before = pa.total_allocated_bytes() if pa is not None else 0
+    frame = load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Arrow buffers come from its own memory pool, which tracemalloc does not see
+    arrow_bytes = (pa.total_allocated_bytes() - arrow_before) if pa is not None else 0
+    # Memory-mapped columns live in the page cache, not on the heap
+    frame_bytes = frame.memory_usage(deep=True).sum() if isinstance(frame, pd.DataFrame) else 0
+    return {"path": name, "rows": rows, "median_ms": statistics.median(timings) * 1000,
+            "peak_mb": (peak + arrow_bytes) / 1024 / 1024, "frame_mb": frame_bytes / 1024 / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and peak memory of loading one symbol's full history.")
+    parser.add_argument("--symbol", default="BENCH")
+    parser.add_argument("--seed-years", type=int, default=10,
+                        help="Seed a scratch collection with this many years of daily bars (0: use existing data)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.seed_years:
+        settings.STOCK_DATA_COLLECTION = "bench_loader_bars"
+        settings.COLUMN_STORE_DIR = tempfile.mkdtemp(prefix="bench_columns_")
+    repository = MongoRepository()
+    try:
+        if args.seed_years:
+            repository.bars_collection().drop()
+            seed_history(repository, args.symbol, args.seed_years)
+
+        paths = [("list(cursor) + apply", lambda: load_with_cursor(repository, args.symbol)),
+                 ("raw BSON columns", lambda: RawBsonBarLoader(repository).load(args.symbol, fields=FIELDS))]
+        if pa is not None:
+            paths.append(("pymongoarrow", lambda: ArrowBarLoader(repository).load(args.symbol, fields=FIELDS)))
+        else:
+            print("pymongoarrow is not installed; skipping the Arrow loader.")
+        # The first column store read fills it from Mongo; the timed reads only map the files
+        column_loader = ColumnStoreLoader(repository)
+        column_loader.load(args.symbol, fields=FIELDS)
+        paths.append(("column store frame", lambda: column_loader.load(args.symbol, fields=FIELDS)))
+        paths.append(("column store views", lambda: ColumnStore().open(args.symbol)))
+
+        for name, load in paths:
+            result = bench(name, load, args.repeat)
+            print(f"{result['path']:<22} rows={result['rows']:<6} median {result['median_ms']:.3f} ms  "
+                  f"peak {result['peak_mb']:.2f} MB  frame {result['frame_mb']:.2f} MB")
+    finally:
+        if args.seed_years:
+            repository.bars_collection().drop()
+            shutil.rmtree(settings.COLUMN_STORE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import time
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import requests
+from table_parsers import TableParserFactory, parse_table
+
+
+def save_pages(stock_codes: List[str], out_dir: str, years: int = 10, last_year: int = None):
+    # Full years only: by default the last complete one and the years before it
+    last_year = last_year or date.today().year - 1
+    os.makedirs(out_dir, exist_ok=True)
+    session = requests.Session()
+    for stock_code in stock_codes:
+        for year in range(last_year - years + 1, last_year + 1):
+            params = {"FromDate": f"01/01/{year}", "ToDate": f"12/31/{year}"}
+            response = session.get(f"https://www.mse.mk/en/stats/symbolhistory/{stock_code}", params=params)
+            response.raise_for_status()
+            with open(os.path.join(out_dir, f"{stock_code}_{year}.html"), "w", encoding="utf-8") as file:
+                file.write(response.text)
+        print(f"Saved {years} pages for {stock_code}.")
+
+
+def load_pages(pages_dir: str) -> List[str]:
+    pages = []
+    for file_name in sorted(os.listdir(pages_dir)):
+        if file_name.endswith(".html"):
+            with open(os.path.join(pages_dir, file_name), "r", encoding="utf-8") as file:
+                pages.append(file.read())
+    return pages
+
+
+def bench_backend(backend: str, pages: List[str], repeat: int, workers: int) -> dict:
+    row_count = 0
+    start_time = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in range(repeat):
+                for rows in executor.map(parse_table, [backend] * len(pages), pages, chunksize=4):
+                    row_count += len(rows)
+    else:
+        for _ in range(repeat):
+            for page in pages:
+                row_count += len(parse_table(backend, page))
+    elapsed = time.perf_counter() - start_time
+    return {"backend": backend, "workers": workers, "rows": row_count, "seconds": elapsed,
+            "rows_per_sec": row_count / elapsed if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of symbol history table parsers.")
+    parser.add_argument("pages_dir", help="Directory with saved mse.mk symbolhistory pages (*.html)")
+    parser.add_argument("--save", nargs="+", metavar="STOCK_CODE", help="Download pages for these symbols first")
+    parser.add_argument("--last-year", type=int, help="Last year to download (default: last complete year)")
+    parser.add_argument("--years", type=int, default=10, help="Number of years to download per symbol")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.save, args.pages_dir, args.years, args.last_year)
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        print(f"No .html pages found in {args.pages_dir}.")
+        return
+
+    print(f"Parsing {len(pages)} pages x {args.repeat}")
+    for backend in TableParserFactory.available_backends():
+        for workers in args.workers:
+            result = bench_backend(backend, pages, args.repeat, workers)
+            print(f"{result['backend']:<12} workers={result['workers']:<3} rows={result['rows']:<8} "
+                  f"{result['seconds']:.3f}s  {result['rows_per_sec']:.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
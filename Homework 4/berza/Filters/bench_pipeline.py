@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import settings
+from metrics import PipelineMetrics
+from repository import MongoRepository
+from standin_server import StandInConfig, run_server
+
+
+def wait_for_server(base_url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{base_url}/__stats", timeout=1).raise_for_status()
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Stand-in server at {base_url} did not start within {timeout} seconds.")
+
+
+def peak_rss_mb() -> dict:
+    # ru_maxrss is reported in kilobytes on Linux
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    }
+
+
+def run_pipeline(base_url: str, collection) -> dict:
+    # Imported late so the overridden settings are the ones the pipeline sees
+    from Filter1 import ValidCompanyFetcher
+    from Filter2 import check_and_get_dates
+    from Filter3 import fetch_and_store_data_for_stocks
+
+    metrics = PipelineMetrics()
+    metrics.reset()
+    stats_before = requests.get(f"{base_url}/__stats").json()
+    rows_before = collection.count_documents({})
+    stages = {}
+
+    start_time = time.perf_counter()
+    stock_codes = ValidCompanyFetcher().fetch_and_store()
+    stages["symbol_discovery"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    stocks_with_dates = check_and_get_dates(stock_codes)
+    stages["watermark_lookup"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    asyncio.run(fetch_and_store_data_for_stocks(stocks_with_dates))
+    stages["fetch_and_store"] = time.perf_counter() - start_time
+
+    stats_after = requests.get(f"{base_url}/__stats").json()
+    total = sum(stages.values())
+    requests_made = stats_after["requests"] - stats_before["requests"]
+    rows_written = collection.count_documents({}) - rows_before
+    return {
+        "symbols": len(stock_codes),
+        "stages_seconds": {stage: round(seconds, 3) for stage, seconds in stages.items()},
+        "total_seconds": round(total, 3),
+        "requests": requests_made,
+        "errors_503": stats_after["errors_503"] - stats_before["errors_503"],
+        "bytes_downloaded": stats_after["bytes_sent"] - stats_before["bytes_sent"],
+        "rows_written": rows_written,
+        "rows_per_sec": round(rows_written / total, 1) if total else 0.0,
+        "requests_per_sec": round(requests_made / total, 1) if total else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "pipeline_metrics": {key: value for key, value in metrics.snapshot().items() if key != "symbols"}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end Filter1 -> Filter2 -> Filter3 benchmark "
+                                                 "against the local stand-in server.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--symbols", type=int, default=140)
+    parser.add_argument("--recordings", help="Directory of saved symbolhistory pages named <CODE>_*.html")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--padding-kb", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=2, help="Later runs measure the incremental path")
+    parser.add_argument("--db", default="bench_stocks_db", help="Scratch database, dropped before the first run")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--cache-mode", default="off", choices=["off", "online", "record", "replay"])
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    settings.MSE_BASE_URL = base_url
+    settings.SEINET_API_URL = f"{base_url}/public"
+    settings.STOCKS_DB = args.db
+    settings.HTTP_CACHE_MODE = args.cache_mode
+    if args.mongo_uri:
+        settings.MONGO_URI = args.mongo_uri
+
+    config = StandInConfig(symbols=args.symbols, recordings_dir=args.recordings, latency_ms=args.latency_ms,
+                           error_rate=args.error_rate, padding_kb=args.padding_kb)
+    server = multiprocessing.Process(target=run_server, args=(config, "127.0.0.1", args.port), daemon=True)
+    server.start()
+
+    repository = MongoRepository()
+    client = repository.client
+    client.drop_database(args.db)
+    # The configured bars collection, so the count also works on the time-series backend
+    collection = repository.bars_collection()
+
+    from Filter1 import FileManager
+    FileManager().file_path = os.path.join(tempfile.mkdtemp(), "valid_companies.txt")
+
+    results = []
+    try:
+        wait_for_server(base_url)
+        for run in range(1, args.runs + 1):
+            result = run_pipeline(base_url, collection)
+            result["run"] = run
+            results.append(result)
+            print(json.dumps(result, indent=2))
+    finally:
+        server.terminate()
+        server.join()
+        client.drop_database(args.db)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
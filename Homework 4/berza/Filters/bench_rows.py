@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from typing import List, Tuple
+
+# The shared modules (settings, http_cache, ...) live in the project root next to main_api.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parsers import load_pages
+from Filter3 import StockDataFetcher
+from row_batches import RowBatch
+from standin_server import StandInConfig, SymbolHistoryStore
+from table_parsers import TableParserFactory, parse_table
+
+Table = Tuple[str, List[List[str]]]
+
+
+def load_tables(pages_dir: str = None, symbols: int = 140, years: int = 10) -> List[Table]:
+    # One table per fetched window: saved mse.mk pages when available, otherwise the stand-in's synthetic history
+    if pages_dir:
+        backend = TableParserFactory.available_backends()[-1]
+        return [("PAGE", parse_table(backend, page)) for page in load_pages(pages_dir)]
+    store = SymbolHistoryStore(StandInConfig(symbols=symbols, history_years=years))
+    tables = []
+    for stock_code in store.symbols:
+        history = store.history(stock_code)
+        for year in sorted({day.year for day in history}):
+            tables.append((stock_code, [cells for day, cells in history.items() if day.year == year]))
+    return tables
+
+
+# Every builder keeps all of its windows, like a non-streaming backfill holding the whole history
+def per_row(tables: List[Table]) -> list:
+    fetcher = StockDataFetcher("http://localhost")
+    return [[row for row in (fetcher.process_row(row_cells, stock_code) for row_cells in cells) if row]
+            for stock_code, cells in tables]
+
+
+def columnar(tables: List[Table]) -> list:
+    return [RowBatch.from_cells(cells, stock_code) for stock_code, cells in tables]
+
+
+def columnar_documents(tables: List[Table]) -> list:
+    # Also builds the documents the writer sends to Mongo, to compare end to end with the per-row path
+    return [RowBatch.from_cells(cells, stock_code).to_documents() for stock_code, cells in tables]
+
+
+def bench(name: str, builder, tables: List[Table], repeat: int) -> dict:
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        rows = sum(len(window) for window in builder(tables))
+    elapsed = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    windows = builder(tables)
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del windows
+    return {"path": name, "rows": rows, "rows_per_sec": rows * repeat / elapsed if elapsed else 0.0,
+            "peak_mb": peak / 1024 / 1024, "held_blocks": blocks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the per-row and columnar row builders of Filter3.")
+    parser.add_argument("--pages-dir", help="Saved mse.mk symbolhistory pages (default: synthetic stand-in history)")
+    parser.add_argument("--symbols", type=int, default=140)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tables = load_tables(args.pages_dir, args.symbols, args.years)
+    print(f"{len(tables)} tables, {sum(len(cells) for _, cells in tables)} table rows x {args.repeat}")
+    for name, builder in [("per-row dicts", per_row), ("columnar", columnar), ("columnar + documents", columnar_documents)]:
+        result = bench(name, builder, tables, args.repeat)
+        print(f"{result['path']:<22} rows={result['rows']:<8} {result['rows_per_sec']:>10.0f} rows/sec  "
+              f"peak {result['peak_mb']:.1f} MB  held blocks {result['held_blocks']}")
+
+
+if __name__ == "__main__":
+    main()
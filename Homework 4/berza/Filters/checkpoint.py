@@ -0,0 +1,128 @@
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+# Every process that owns a run heartbeats it; a run without a heartbeat for STALE_SECONDS has lost its owner
+HEARTBEAT_SECONDS = 60
+STALE_SECONDS = 5 * HEARTBEAT_SECONDS
+# Unfinished runs of dead owners stay resumable this long before a new run abandons them
+RESUMABLE_DAYS = 7
+
+
+# Persists every (symbol, window) unit of a run as soon as its rows are stored,
+# so an interrupted backfill can be resumed with the same plan and skip the finished units.
+# Runs belong to an owner process and a scope (the kind of invocation: ingest, scheduler, ...). Runs whose owner is
+# still alive are never touched by anyone else; another process in the same scope may resume or abandon them only
+# once their heartbeat has stopped.
+class CheckpointStore:
+    def __init__(self, db, runs_collection: str = "ingest_runs", units_collection: str = "ingest_checkpoints"):
+        self.runs = db[runs_collection]
+        self.units = db[units_collection]
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start_run(self, companies_with_dates: List[dict], end_date: str, scope: str = "ingest") -> dict:
+        # Dead runs stay resumable for a while; only old ones of this scope are cleared here
+        for run in self.runs.find({**self._unfinished(scope),
+                                   "started_at": {"$lt": datetime.now() - timedelta(days=RESUMABLE_DAYS)}}):
+            if not self.is_alive(run):
+                self.abandon_run(run["_id"])
+        run = {
+            "_id": uuid4().hex,
+            "status": "running",
+            "scope": scope,
+            "owner": self.owner,
+            "started_at": datetime.now(),
+            "heartbeat_at": datetime.now(),
+            "end_date": end_date,
+            "companies": companies_with_dates
+        }
+        self.runs.insert_one(run)
+        return run
+
+    @staticmethod
+    def _unfinished(scope: str) -> dict:
+        # Runs recorded before scopes existed were all plain ingest runs
+        return {"status": "running", "scope": {"$in": [scope, None]} if scope == "ingest" else scope}
+
+    def is_alive(self, run: dict) -> bool:
+        heartbeat_at = run.get("heartbeat_at")
+        if heartbeat_at is None or heartbeat_at < datetime.now() - timedelta(seconds=STALE_SECONDS):
+            return False
+        host, _, pid = run.get("owner", "").partition(":")
+        if host == socket.gethostname() and pid.isdigit():
+            # On the same host a crashed owner is known right away, without waiting for its heartbeat to expire
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                pass
+        return True
+
+    def latest_unfinished_run(self, scope: str = "ingest") -> Optional[dict]:
+        # Only a run whose owner is gone can be resumed; a live one is still doing its own work
+        for run in self.runs.find(self._unfinished(scope)).sort("started_at", -1):
+            if not self.is_alive(run):
+                return run
+        return None
+
+    def claim(self, run: dict) -> dict:
+        # A resumed run belongs to the process that continues it
+        self.runs.update_one({"_id": run["_id"]}, {"$set": {"owner": self.owner, "heartbeat_at": datetime.now()}})
+        return {**run, "owner": self.owner}
+
+    def heartbeat(self, run_id: str):
+        self.runs.update_one({"_id": run_id, "owner": self.owner}, {"$set": {"heartbeat_at": datetime.now()}})
+
+    @contextmanager
+    def keep_alive(self, run_id: str):
+        # A daemon thread heartbeats while the run's work goes on, however long a single window takes
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(HEARTBEAT_SECONDS):
+                try:
+                    self.heartbeat(run_id)
+                except Exception as e:
+                    print(f"Could not heartbeat run {run_id}: {e}")
+
+        thread = threading.Thread(target=beat, name=f"run-heartbeat-{run_id[:8]}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+
+    def completed_units(self, run_id: str) -> Dict[str, List[dict]]:
+        units = {}
+        for unit in self.units.find({"run_id": run_id}):
+            units.setdefault(unit["stock_code"], []).append(unit)
+        return units
+
+    def mark_done(self, run_id: str, stock_code: str, window_from: str, window_to: str, rows: int,
+                  last_date: str = None):
+        self.units.update_one(
+            {"_id": f"{run_id}:{stock_code}:{window_from}:{window_to}"},
+            {"$set": {
+                "run_id": run_id,
+                "stock_code": stock_code,
+                "from_date": window_from,
+                "to_date": window_to,
+                "rows": rows,
+                "last_date": last_date,
+                "completed_at": datetime.now()
+            }},
+            upsert=True
+        )
+
+    def finish_run(self, run_id: str):
+        self.runs.update_one({"_id": run_id}, {"$set": {"status": "completed", "finished_at": datetime.now()}})
+        self.units.delete_many({"run_id": run_id})
+
+    def abandon_run(self, run_id: str):
+        self.runs.update_one({"_id": run_id}, {"$set": {"status": "abandoned", "finished_at": datetime.now()}})
+        self.units.delete_many({"run_id": run_id})
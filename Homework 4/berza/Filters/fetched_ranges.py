@@ -0,0 +1,49 @@
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+from pymongo import ASCENDING
+
+
+# Repository Pattern for the date ranges that were fetched from the exchange and stored successfully.
+# A trading day inside such a range without a stored bar had no trades (Filter3 drops volume 0 rows), so the
+# gap scanner skips it. Every ingest records its windows, which keeps the first scan of an illiquid symbol's
+# history from re-requesting most of it.
+class FetchedRangeStore:
+    def __init__(self, db, collection_name: str = "gap_checks"):
+        self.collection = db[collection_name]
+        self.collection.create_index([("stock_code", ASCENDING), ("from_date", ASCENDING)])
+
+    def mark_fetched(self, stock_code: str, from_date: str, to_date: str):
+        # Extends a range this one overlaps or continues, so daily runs do not add a document per symbol per day
+        touching = (date.fromisoformat(from_date) - timedelta(days=1)).isoformat()
+        result = self.collection.update_one(
+            {"stock_code": stock_code, "from_date": {"$lte": from_date}, "to_date": {"$gte": touching}},
+            {"$max": {"to_date": to_date}, "$set": {"checked_at": datetime.now()}}
+        )
+        if not result.matched_count:
+            self.collection.insert_one({"stock_code": stock_code, "from_date": from_date, "to_date": to_date,
+                                        "checked_at": datetime.now()})
+
+    def ranges(self, stock_codes: List[str]) -> Dict[str, "FetchedRanges"]:
+        found = {}
+        for check in self.collection.find({"stock_code": {"$in": stock_codes}}):
+            found.setdefault(check["stock_code"], []).append((date.fromisoformat(str(check["from_date"])[:10]),
+                                                              date.fromisoformat(str(check["to_date"])[:10])))
+        return {stock_code: FetchedRanges(ranges) for stock_code, ranges in found.items()}
+
+
+# The merged, sorted ranges of one symbol, so each day is looked up with one bisect
+class FetchedRanges:
+    def __init__(self, ranges: List[Tuple[date, date]]):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(ranges):
+            if self.ends and start <= self.ends[-1] + timedelta(days=1):
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __contains__(self, day: date) -> bool:
+        index = bisect_right(self.starts, day) - 1
+        return index >= 0 and day <= self.ends[index]
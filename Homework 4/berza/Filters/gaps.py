@@ -0,0 +1,116 @@
+import asyncio
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+from Filter3 import DataProcessor, StockDataFetcher
+from fetched_ranges import FetchedRanges, FetchedRangeStore
+from metrics import PipelineMetrics
+from repository import MongoRepository
+from trading_calendar import TradingCalendar, default_calendar
+import schema
+import settings
+
+
+# Finds trading days missing from the middle of each symbol's stored history.
+# Days inside a range that was already fetched successfully (by an ingest or an earlier backfill) had no trades
+# on an illiquid symbol, so they are not reported or fetched again.
+class GapScanner:
+    def __init__(self, db, calendar: TradingCalendar = None, data_collection_name: str = None,
+                 checks_collection_name: str = "gap_checks"):
+        self.data_collection = db[data_collection_name or settings.STOCK_DATA_COLLECTION]
+        self.fetched = FetchedRangeStore(db, checks_collection_name)
+        self.calendar = calendar or default_calendar()
+
+    def stored_dates(self, stock_codes: List[str] = None, since: str = None) -> Dict[str, List[date]]:
+        # One aggregation returns every stored date of every symbol, so the scan costs a single round trip
+        match = {}
+        if stock_codes:
+            match["company_name"] = {"$in": stock_codes}
+        if since:
+            match.update(schema.date_range_filter(since))
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$company_name", "dates": {"$push": "$date"}}}
+        ]
+        return {
+            result["_id"]: sorted(as_date(value) for value in result["dates"])
+            for result in self.data_collection.aggregate(pipeline, allowDiskUse=True)
+        }
+
+    def scan(self, stock_codes: List[str] = None, since: str = None) -> Dict[str, List[date]]:
+        stored = self.stored_dates(stock_codes, since)
+        fetched = self.fetched.ranges(list(stored))
+        gaps = {}
+        for stock_code, dates in stored.items():
+            present = set(dates)
+            checked = fetched.get(stock_code, FetchedRanges([]))
+            # Only the span between the first and last stored bar is a gap; anything newer is Filter2's job
+            missing = [
+                day for day in self.calendar.trading_days(dates[0], dates[-1])
+                if day not in present and day not in checked
+            ]
+            if missing:
+                gaps[stock_code] = missing
+        return gaps
+
+
+def as_date(value) -> date:
+    # Works for the stored "YYYY-MM-DD" strings as well as BSON datetimes
+    return date.fromisoformat(str(value)[:10])
+
+
+def plan_backfill(missing_days: List[date], window_days: int) -> List[Tuple[date, date]]:
+    # One window per calendar period of plan_windows that holds gap days, narrowed to its first and last gap day.
+    # store_range plans the same periods again, so every window here is exactly one request.
+    if not missing_days:
+        return []
+    periods = StockDataFetcher.plan_windows(datetime.combine(missing_days[0], datetime.min.time()),
+                                            datetime.combine(missing_days[-1], datetime.min.time()), window_days)
+    windows = []
+    for period_start, period_end in reversed(periods):
+        first = bisect_left(missing_days, period_start.date())
+        last = bisect_right(missing_days, period_end.date())
+        if first < last:
+            windows.append((missing_days[first], missing_days[last - 1]))
+    return windows
+
+
+async def backfill_symbol(processor: DataProcessor, session, stock_code: str,
+                          windows: List[Tuple[date, date]], window_days: int) -> bool:
+    succeeded = True
+    for start, end in windows:
+        # store_range records the fetched windows: whatever is still missing inside them had no trades.
+        # The window size of the plan is pinned, so each planned window stays a single request.
+        ok, _ = await processor.store_range(session, stock_code, start.isoformat(), end.isoformat(), window_days)
+        if ok:
+            processor.metrics.increment("backfill_windows", symbol=stock_code)
+        succeeded = succeeded and ok
+    return succeeded
+
+
+async def backfill_gaps(stock_codes: List[str] = None, since: str = None, dry_run: bool = False) -> bool:
+    db = MongoRepository().database()
+    scanner = GapScanner(db)
+    fetcher = StockDataFetcher(f"{settings.MSE_BASE_URL}/en/stats/symbolhistory")
+
+    gaps = scanner.scan(stock_codes, since)
+    window_days = {stock_code: fetcher.window_days(stock_code) for stock_code in gaps}
+    plans = {stock_code: plan_backfill(days, window_days[stock_code]) for stock_code, days in gaps.items()}
+    PipelineMetrics().increment("gap_days", sum(len(days) for days in gaps.values()))
+
+    for stock_code, windows in sorted(plans.items()):
+        print(f"{stock_code}: {len(gaps[stock_code])} missing trading days in {len(windows)} windows")
+    if not plans:
+        print("No gaps found.")
+    if dry_run or not plans:
+        return True
+
+    # The watermark is left alone: gaps lie inside the history that is already covered
+    processor = DataProcessor(fetcher, db[settings.STOCK_DATA_COLLECTION])
+    async with processor.open_session() as session:
+        results = await asyncio.gather(*[
+            backfill_symbol(processor, session, stock_code, windows, window_days[stock_code]) for stock_code, windows in plans.items()
+        ])
+    if not all(results):
+        print("Some backfill windows failed; run the backfill again to retry them.")
+    return all(results)
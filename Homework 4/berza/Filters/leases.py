@@ -0,0 +1,151 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List, Optional
+from uuid import uuid4
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from Filter3 import DataProcessor, StockDataFetcher
+from repository import MongoRepository
+from watermarks import WatermarkStore
+import settings
+
+
+# Work distribution through expiring lease documents in MongoDB.
+# Any number of scrapers claim (symbol, date-range) units with an atomic findOneAndUpdate;
+# a unit whose lease ran out (crashed or stalled node) is simply claimed again by someone else.
+class LeaseQueue:
+    def __init__(self, db, lease_seconds: int = 300, max_attempts: int = 5, owner: str = None,
+                 units_collection: str = "ingest_work_units", batches_collection: str = "ingest_batches"):
+        self.units = db[units_collection]
+        self.batches = db[batches_collection]
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self.units.create_index([("batch_id", ASCENDING), ("state", ASCENDING), ("lease_expires", ASCENDING)])
+        self.units.create_index([("batch_id", ASCENDING), ("stock_code", ASCENDING)])
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.utcnow()
+
+    def seed(self, batch_id: str, companies_with_dates: List[dict], end_date: str, window_days: int = 365) -> bool:
+        # Only the first node to register the batch plans it, so every node works on the same set of units
+        try:
+            self.batches.insert_one({"_id": batch_id, "end_date": end_date, "seeded_by": self.owner,
+                                     "created_at": self.now()})
+        except DuplicateKeyError:
+            return False
+
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        operations = []
+        for company in companies_with_dates:
+            start = datetime.strptime(company.get("from_date", company["last_date"]), '%Y-%m-%d')
+            for window_start, window_end in StockDataFetcher.plan_windows(start, end, window_days):
+                unit_from, unit_to = window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')
+                operations.append(UpdateOne(
+                    {"_id": f"{batch_id}:{company['stock_code']}:{unit_from}:{unit_to}"},
+                    {"$setOnInsert": {"batch_id": batch_id, "stock_code": company["stock_code"],
+                                      "from_date": unit_from, "to_date": unit_to, "state": "pending",
+                                      "attempts": 0, "lease_owner": None, "lease_expires": None}},
+                    upsert=True
+                ))
+        if operations:
+            self.units.bulk_write(operations, ordered=False)
+        print(f"Seeded batch {batch_id} with {len(operations)} work units.")
+        return True
+
+    def claim(self, batch_id: str) -> Optional[dict]:
+        now = self.now()
+        return self.units.find_one_and_update(
+            {"batch_id": batch_id, "$or": [
+                {"state": "pending"},
+                {"state": "leased", "lease_expires": {"$lt": now}}
+            ]},
+            {"$set": {"state": "leased", "lease_owner": self.owner, "lease_expires": now + self.lease},
+             "$inc": {"attempts": 1}},
+            sort=[("to_date", -1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def renew(self, unit: dict) -> bool:
+        result = self.units.update_one({"_id": unit["_id"], "lease_owner": self.owner, "state": "leased"},
+                                       {"$set": {"lease_expires": self.now() + self.lease}})
+        return result.matched_count == 1
+
+    async def keep_alive(self, unit: dict):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            if not await asyncio.to_thread(self.renew, unit):
+                print(f"Lost the lease on {unit['_id']}; another node has taken it over.")
+                return
+
+    def complete(self, unit: dict, last_date: Optional[str]):
+        # Writes are idempotent upserts, so finishing a unit whose lease was taken over is harmless
+        self.units.update_one({"_id": unit["_id"]},
+                              {"$set": {"state": "done", "last_date": last_date, "lease_owner": self.owner,
+                                        "completed_at": self.now()}})
+
+    def release(self, unit: dict):
+        state = "failed" if unit["attempts"] >= self.max_attempts else "pending"
+        self.units.update_one({"_id": unit["_id"], "lease_owner": self.owner},
+                              {"$set": {"state": state, "lease_owner": None, "lease_expires": None}})
+
+    def remaining(self, batch_id: str) -> int:
+        return self.units.count_documents({"batch_id": batch_id, "state": {"$in": ["pending", "leased"]}})
+
+    def symbol_last_date(self, batch_id: str, stock_code: str) -> Optional[str]:
+        # The watermark may only move once every unit of the symbol is done, otherwise an unfinished unit leaves a hole
+        units = list(self.units.find({"batch_id": batch_id, "stock_code": stock_code}, {"state": 1, "last_date": 1}))
+        if any(unit["state"] != "done" for unit in units):
+            return None
+        return max((unit["last_date"] for unit in units if unit.get("last_date")), default=None)
+
+
+async def lease_worker(leases: LeaseQueue, processor: DataProcessor, session, watermarks: WatermarkStore,
+                       batch_id: str, poll_seconds: float):
+    while True:
+        unit = await asyncio.to_thread(leases.claim, batch_id)
+        if unit is None:
+            if await asyncio.to_thread(leases.remaining, batch_id) == 0:
+                return
+            # Everything left is leased by other nodes; wait for them to finish or for a lease to expire
+            await asyncio.sleep(poll_seconds)
+            continue
+
+        heartbeat = asyncio.create_task(leases.keep_alive(unit))
+        try:
+            succeeded, last_date = await processor.store_range(session, unit["stock_code"], unit["from_date"],
+                                                               unit["to_date"])
+        finally:
+            heartbeat.cancel()
+
+        if not succeeded:
+            await asyncio.to_thread(leases.release, unit)
+            continue
+        await asyncio.to_thread(leases.complete, unit, last_date)
+        symbol_last_date = await asyncio.to_thread(leases.symbol_last_date, batch_id, unit["stock_code"])
+        if symbol_last_date:
+            await asyncio.to_thread(watermarks.advance, unit["stock_code"], symbol_last_date)
+
+
+async def run_distributed(companies_with_dates: List[dict], batch_id: str = None, workers: int = 8,
+                          lease_seconds: int = 300, poll_seconds: float = 10.0):
+    db = MongoRepository().database()
+    end_date = settings.as_of_date().strftime('%Y-%m-%d')
+    batch_id = batch_id or end_date
+    leases = LeaseQueue(db, lease_seconds=lease_seconds)
+    if not leases.seed(batch_id, companies_with_dates, end_date):
+        print(f"Joining batch {batch_id} as {leases.owner}.")
+
+    watermarks = WatermarkStore(db)
+    fetcher = StockDataFetcher(f"{settings.MSE_BASE_URL}/en/stats/symbolhistory")
+    processor = DataProcessor(fetcher, db[settings.STOCK_DATA_COLLECTION], watermarks)
+    async with processor.open_session() as session:
+        await asyncio.gather(*[
+            lease_worker(leases, processor, session, watermarks, batch_id, poll_seconds) for _ in range(workers)
+        ])
+
+    failed = leases.units.count_documents({"batch_id": batch_id, "state": "failed"})
+    print(f"Batch {batch_id} finished on this node; {failed} units failed after {leases.max_attempts} attempts.")
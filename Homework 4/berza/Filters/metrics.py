@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+class Histogram:
+    def __init__(self, buckets: List[float] = None):
+        self.buckets = buckets or LATENCY_BUCKETS
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def merge(self, data: dict):
+        self.counts = [own + other for own, other in zip(self.counts, data["counts"])]
+        self.count += data["count"]
+        self.sum += data["sum"]
+
+    def to_dict(self) -> dict:
+        return {"buckets": self.buckets, "counts": self.counts, "count": self.count, "sum": round(self.sum, 6)}
+
+
+# Singleton registry for ingest metrics: stage timings, latency histograms and per-symbol counters.
+# Stages that overlap on the event loop (fetch, parse, store) accumulate time across all coroutines.
+class PipelineMetrics:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance.reset()
+        return cls._instance
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.stages: Dict[str, float] = {}
+            self.counters: Dict[str, float] = {}
+            self.histograms: Dict[str, Histogram] = {}
+            self.symbols: Dict[str, Dict[str, float]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - start_time)
+
+    def add_stage_time(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.histograms.setdefault(name, Histogram()).observe(value)
+
+    def increment(self, name: str, value: float = 1, symbol: str = None):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if symbol:
+                symbol_counters = self.symbols.setdefault(symbol, {})
+                symbol_counters[name] = symbol_counters.get(name, 0) + value
+
+    def merge(self, snapshot: dict):
+        # Folds in a snapshot taken in another process, e.g. an ingest shard
+        with self._lock:
+            for name, seconds in snapshot["stages_seconds"].items():
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, data in snapshot["histograms"].items():
+                self.histograms.setdefault(name, Histogram(data["buckets"])).merge(data)
+            for symbol, counters in snapshot["symbols"].items():
+                symbol_counters = self.symbols.setdefault(symbol, {})
+                for name, value in counters.items():
+                    symbol_counters[name] = symbol_counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "elapsed_seconds": round(time.time() - self.started_at, 3),
+                "stages_seconds": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "symbols": {symbol: dict(counters) for symbol, counters in self.symbols.items()}
+            }
+
+    def to_json(self, path: str = None) -> str:
+        data = json.dumps(self.snapshot(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(data)
+        return data
+
+    def to_prometheus(self, path: str = None) -> str:
+        snapshot = self.snapshot()
+        lines = ["# HELP ingest_stage_seconds Time spent per pipeline stage.",
+                 "# TYPE ingest_stage_seconds gauge"]
+        lines += [f'ingest_stage_seconds{{stage="{name}"}} {seconds}'
+                  for name, seconds in snapshot["stages_seconds"].items()]
+
+        for name, value in snapshot["counters"].items():
+            lines += [f"# TYPE ingest_{name}_total counter", f"ingest_{name}_total {value}"]
+
+        for name, histogram in snapshot["histograms"].items():
+            lines.append(f"# TYPE ingest_{name} histogram")
+            lines += [f'ingest_{name}_bucket{{le="{bound}"}} {count}'
+                      for bound, count in zip(histogram["buckets"], histogram["counts"])]
+            lines += [f'ingest_{name}_bucket{{le="+Inf"}} {histogram["count"]}',
+                      f"ingest_{name}_sum {histogram['sum']}",
+                      f"ingest_{name}_count {histogram['count']}"]
+
+        metric_names = sorted({name for counters in snapshot["symbols"].values() for name in counters})
+        for name in metric_names:
+            lines.append(f"# TYPE ingest_symbol_{name}_total counter")
+            lines += [f'ingest_symbol_{name}_total{{symbol="{symbol}"}} {counters[name]}'
+                      for symbol, counters in sorted(snapshot["symbols"].items()) if name in counters]
+
+        data = "\n".join(lines) + "\n"
+        if path:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(data)
+        return data
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+
+
+# Shared rate controller: a token bucket caps requests per second and an AIMD limit caps requests in flight.
+# Throttling signals (503s, timeouts) halve both; every full round of successes adds one slot and one request/sec.
+class RateController:
+    def __init__(self, rate: float = 10.0, burst: int = 10, min_rate: float = 0.5, max_rate: float = 50.0,
+                 concurrency: int = 5, min_concurrency: int = 1, max_concurrency: int = 10,
+                 decrease_factor: float = 0.5, cooldown: float = 2.0, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = min(concurrency, max_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self._refilled_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._successes_in_round = 0
+        self._condition = None
+        self.counters = {"requests": 0, "successes": 0, "throttled": 0, "errors": 0}
+
+    def split(self, parts: int) -> "RateController":
+        # A controller holding 1/parts of this budget, for processes that share the same site limits
+        return RateController(rate=max(self.min_rate, self.rate / parts), burst=max(1, self.burst // parts),
+                              min_rate=self.min_rate / parts, max_rate=self.max_rate / parts,
+                              concurrency=max(1, int(self.concurrency) // parts), min_concurrency=1,
+                              max_concurrency=max(1, self.max_concurrency // parts),
+                              decrease_factor=self.decrease_factor, cooldown=self.cooldown,
+                              base_delay=self.base_delay, max_delay=self.max_delay)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.concurrency))
+            self.in_flight += 1
+        await self._take_token()
+        self.counters["requests"] += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    async def _take_token(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so the controller can be built outside of a running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def on_success(self):
+        self.counters["successes"] += 1
+        self._successes_in_round += 1
+        if self._successes_in_round >= int(self.concurrency):
+            self._successes_in_round = 0
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.rate = min(self.max_rate, self.rate + 1)
+
+    def on_throttle(self):
+        self.counters["throttled"] += 1
+        now = time.monotonic()
+        # One decrease per cooldown, otherwise a burst of 503s from the same round collapses the limits to the floor
+        if now - self._decreased_at < self.cooldown:
+            return
+        self._decreased_at = now
+        self._successes_in_round = 0
+        self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def on_error(self):
+        self.counters["errors"] += 1
+
+    def backoff_delay(self, attempt: int) -> float:
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": round(self.rate, 2),
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            **self.counters
+        }
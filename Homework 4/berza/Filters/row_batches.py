@@ -0,0 +1,128 @@
+from itertools import repeat
+from typing import Dict, List, Tuple
+import numpy as np
+from table_parsers import parse_table
+from schema import SCHEMA_VERSION
+
+# Cell positions of the numeric columns in the symbol history table (column 0 is the date, 6 the volume)
+PRICE_COLUMNS = {
+    "last_trade_price": 1,
+    "max_price": 2,
+    "min_price": 3,
+    "avg_price": 4,
+    "percent_change": 5,
+    "turnover": 7,
+    "total_turnover": 8
+}
+FIELDS = ["last_trade_price", "max_price", "min_price", "avg_price", "percent_change", "volume", "turnover",
+          "total_turnover"]
+SEPARATOR = "\x1f"
+
+
+def parse_numbers(cells: np.ndarray) -> np.ndarray:
+    # Vectorized DefaultPriceFormatter over a block of cells: one join/replace/split instead of a call per cell,
+    # then a single C-level string to float64 conversion; empty cells become 0.0
+    values = np.array(SEPARATOR.join(cells.ravel().tolist()).replace(",", "").split(SEPARATOR))
+    values[values == ""] = "0"
+    try:
+        return values.astype(np.float64).reshape(cells.shape)
+    except ValueError:
+        # Rare malformed cells (several dots, stray text) fall back to a per-cell parse
+        return np.array([parse_number(value) for value in values.tolist()], dtype=np.float64).reshape(cells.shape)
+
+
+def parse_number(value: str) -> float:
+    # Same rules as DefaultPriceFormatter for a cell whose commas are already removed: keep only the last dot
+    try:
+        return float(value.replace(".", "", value.count(".") - 1))
+    except ValueError:
+        return 0.0
+
+
+def parse_dates(cells: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # "M/D/YYYY" strings become datetime64[D] through integer month/day/year columns.
+    # Also returns the mask of cells that are real dates; the others are rejected like strptime in process_row does.
+    cells = np.array(cells, dtype=str)
+    valid = np.char.count(cells, "/") == 2
+    parts = np.zeros((len(cells), 3), dtype=np.int64)
+    try:
+        parts[valid] = np.array("/".join(cells[valid].tolist()).split("/"), dtype=np.int64).reshape(-1, 3)
+    except ValueError:
+        # Rare cells with stray text fall back to a per-cell parse
+        for index in np.flatnonzero(valid):
+            try:
+                parts[index] = [int(part) for part in cells[index].split("/")]
+            except ValueError:
+                valid[index] = False
+    valid &= (parts[:, 0] >= 1) & (parts[:, 0] <= 12) & (parts[:, 1] >= 1)
+    months = (parts[:, 2] - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (parts[:, 0] - 1)
+    dates = months.astype("datetime64[D]") + (parts[:, 1] - 1)
+    # A day past the end of its month (2/30) would roll over into the next one
+    valid &= dates < (months + 1).astype("datetime64[D]")
+    return dates, valid
+
+
+# Columnar batch of bars for one symbol: a datetime64[D] date array plus one typed array per field.
+# Replaces the per-row dicts on the way from the parser to the writer.
+class RowBatch:
+    def __init__(self, company_name: str, dates: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.company_name = company_name
+        self.dates = dates
+        self.columns = columns
+
+    @classmethod
+    def empty(cls, company_name: str) -> "RowBatch":
+        columns = {field: np.empty(0, dtype=np.int64 if field == "volume" else np.float64) for field in FIELDS}
+        return cls(company_name, np.empty(0, dtype="datetime64[D]"), columns)
+
+    @classmethod
+    def from_cells(cls, cells: List[List[str]], company_name: str) -> "RowBatch":
+        rows = [row[:9] for row in cells if len(row) >= 9]
+        if not rows:
+            return cls.empty(company_name)
+
+        table = np.array(rows)
+        numbers = parse_numbers(table[:, 1:9])
+        dates, valid = parse_dates(table[:, 0].tolist())
+        # Days without trades and rows without a real date are skipped, exactly as process_row does
+        keep = (numbers[:, 5] != 0) & valid
+        numbers = numbers[keep].T.copy()
+
+        columns = {field: numbers[index - 1] for field, index in PRICE_COLUMNS.items()}
+        columns["volume"] = numbers[5].astype(np.int64)
+        return cls(company_name, dates[keep], columns)
+
+    @classmethod
+    def concat(cls, company_name: str, batches: List["RowBatch"]) -> "RowBatch":
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty(company_name)
+        dates = np.concatenate([batch.dates for batch in batches])
+        order = np.argsort(dates, kind="stable")
+        columns = {field: np.concatenate([batch.columns[field] for batch in batches])[order] for field in FIELDS}
+        return cls(company_name, dates[order], columns)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def date_strings(self) -> np.ndarray:
+        return np.datetime_as_string(self.dates, unit="D")
+
+    def first_date(self) -> str:
+        return str(self.dates.min())
+
+    def last_date(self) -> str:
+        return str(self.dates.max())
+
+    def to_documents(self) -> List[dict]:
+        # tolist() converts whole columns to Python scalars in C, instead of one float() call per cell
+        # Documents follow the typed schema: datetime dates, float prices, int volume
+        keys = ["company_name", "date", "schema_version"] + FIELDS
+        values = [self.columns[field].tolist() for field in FIELDS]
+        dates = self.dates.astype("datetime64[ms]").tolist()
+        return [dict(zip(keys, row)) for row in zip(repeat(self.company_name), dates, repeat(SCHEMA_VERSION), *values)]
+
+
+def parse_batch(backend: str, html: str, company_name: str) -> RowBatch:
+    # Parsing and column conversion both run in the parse worker; only the typed arrays are pickled back
+    return RowBatch.from_cells(parse_table(backend, html), company_name)
@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime, time as dt_time, timedelta
+from typing import Dict, List
+from checkpoint import CheckpointStore
+from Filter1 import fetch_valid
+from Filter2 import check_and_get_dates
+from Filter3 import create_processor, finish_run, open_run
+from liquid_stocks import most_liquid_stocks
+from repository import MongoRepository
+from trading_calendar import default_calendar
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo("Europe/Skopje")
+except Exception:
+    MARKET_TZ = None
+
+
+class SymbolSchedule:
+    def __init__(self, stock_code: str):
+        self.stock_code = stock_code
+        self.next_check = datetime.min.replace(tzinfo=MARKET_TZ)
+        self.idle_runs = 0
+        self.last_date = None
+
+
+# Long-running ingest: intraday polling during the session and one refresh after the close.
+# Symbols are fetched in liquidity order, and symbols without new trades back off exponentially.
+class IngestScheduler:
+    def __init__(self, poll_interval_minutes: int = 30, market_open: str = "09:00", market_close: str = "13:00",
+                 refresh_delay_minutes: int = 30, max_backoff_minutes: int = 7 * 24 * 60, batch_size: int = 20,
+                 tick_seconds: int = 60):
+        self.poll_interval = timedelta(minutes=poll_interval_minutes)
+        self.market_open = dt_time.fromisoformat(market_open)
+        self.market_close = dt_time.fromisoformat(market_close)
+        self.refresh_delay = timedelta(minutes=refresh_delay_minutes)
+        self.max_backoff = timedelta(minutes=max_backoff_minutes)
+        self.batch_size = batch_size
+        self.tick_seconds = tick_seconds
+        self.calendar = default_calendar()
+        self.schedules: Dict[str, SymbolSchedule] = {}
+        self.liquidity_rank: Dict[str, int] = {}
+        self.last_refresh = None
+        self.last_symbol_update = None
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(MARKET_TZ)
+
+    def is_trading_day(self, now: datetime) -> bool:
+        # Weekends and MSE holidays (trading_calendar, plus MSE_EXTRA_HOLIDAYS)
+        return self.calendar.is_trading_day(now.date())
+
+    def in_session(self, now: datetime) -> bool:
+        return self.is_trading_day(now) and self.market_open <= now.time() <= self.market_close
+
+    def refresh_due(self, now: datetime) -> bool:
+        close_refresh = datetime.combine(now.date(), self.market_close, tzinfo=now.tzinfo) + self.refresh_delay
+        return self.is_trading_day(now) and now >= close_refresh and self.last_refresh != now.date()
+
+    def update_symbols(self, now: datetime):
+        # Once a day: pick up new listings and re-rank by the turnover table on the exchange homepage
+        if self.last_symbol_update == now.date():
+            return
+        for stock_code in fetch_valid():
+            self.schedules.setdefault(stock_code, SymbolSchedule(stock_code))
+        self.liquidity_rank = self.rank_by_liquidity()
+        self.last_symbol_update = now.date()
+
+    @staticmethod
+    def rank_by_liquidity() -> Dict[str, int]:
+        data = most_liquid_stocks()
+        if not isinstance(data, list):
+            return {}
+        turnovers = {}
+        for row in data:
+            try:
+                turnovers[row["Company_Code"]] = float(row["turnover"].replace(".", "").replace(",", "."))
+            except (KeyError, ValueError):
+                continue
+        ranked = sorted(turnovers, key=turnovers.get, reverse=True)
+        return {stock_code: rank for rank, stock_code in enumerate(ranked)}
+
+    def order(self, stock_codes: List[str]) -> List[str]:
+        # Listed by turnover first, then the symbols that traded most recently
+        unranked = len(self.liquidity_rank)
+        return sorted(stock_codes, key=lambda code: (self.liquidity_rank.get(code, unranked),
+                                                     self.schedules[code].idle_runs))
+
+    def due_symbols(self, now: datetime, refresh: bool) -> List[str]:
+        # The after-close refresh also takes every symbol with a bar stored today, even one backing off,
+        # so the partial bar of the intraday polls is replaced by the final one
+        today = now.strftime('%Y-%m-%d')
+        due = [code for code, schedule in self.schedules.items()
+               if schedule.next_check <= now or (refresh and (schedule.idle_runs == 0 or schedule.last_date == today))]
+        return self.order(due)
+
+    async def run_cycle(self, stock_codes: List[str], now: datetime):
+        # One checkpoint run, one HTTP session and one parse pool per cycle; the batches only pace the rescheduling
+        db = MongoRepository().database()
+        run = open_run(db, check_and_get_dates(stock_codes), scope="scheduler")
+        processor = create_processor(db)
+        processor.use_run(run["_id"])
+        succeeded = True
+        with CheckpointStore(db).keep_alive(run["_id"]):
+            async with processor.open_session() as session:
+                for start in range(0, len(run["companies"]), self.batch_size):
+                    batch = run["companies"][start:start + self.batch_size]
+                    stored = await processor.store_companies(session, batch, run["end_date"])
+                    succeeded = succeeded and stored
+                    for stock_dates in check_and_get_dates([company["stock_code"] for company in batch]):
+                        self.reschedule(stock_dates["stock_code"], stock_dates["last_date"], now)
+        if succeeded:
+            finish_run(db, run, succeeded)
+        else:
+            # The next cycle plans again from the watermarks, so a failed cycle's units are not kept for a resume
+            CheckpointStore(db).abandon_run(run["_id"])
+
+    def reschedule(self, stock_code: str, last_date: str, now: datetime):
+        schedule = self.schedules[stock_code]
+        if schedule.last_date is None or last_date > schedule.last_date:
+            schedule.idle_runs = 0
+            schedule.next_check = now + self.poll_interval
+        else:
+            schedule.idle_runs += 1
+            schedule.next_check = now + min(self.max_backoff, self.poll_interval * 2 ** schedule.idle_runs)
+        schedule.last_date = last_date
+
+    async def run_forever(self):
+        print("Ingest scheduler started.")
+        while True:
+            now = self.now()
+            try:
+                refresh = self.refresh_due(now)
+                if self.in_session(now) or refresh:
+                    self.update_symbols(now)
+                    due = self.due_symbols(now, refresh)
+                    if due:
+                        print(f"{now:%Y-%m-%d %H:%M} refreshing {len(due)} symbols "
+                              f"({'after close' if refresh else 'intraday'})...")
+                        await self.run_cycle(due, now)
+                    if refresh:
+                        self.last_refresh = now.date()
+            except Exception as e:
+                print(f"An error occurred during the scheduled ingest: {e}")
+            await asyncio.sleep(self.tick_seconds)
@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import multiprocessing
+import os
+import queue
+import time
+from datetime import datetime
+from typing import Dict, List
+from checkpoint import CheckpointStore
+from Filter3 import finish_run, open_run, store_run_companies
+from metrics import PipelineMetrics
+from rate_limiter import RateController
+from repository import MongoRepository
+import settings
+
+DEFAULT_ROWS_PER_DAY = 0.3
+
+
+def estimate_rows(db, companies_with_dates: List[dict], end_date: str) -> Dict[str, float]:
+    # Expected rows = days still to fetch x the symbol's historical trading density
+    pipeline = [
+        {"$match": {"company_name": {"$in": [company["stock_code"] for company in companies_with_dates]}}},
+        {"$group": {"_id": "$company_name", "rows": {"$sum": 1},
+                    "first_date": {"$min": "$date"}, "last_date": {"$max": "$date"}}}
+    ]
+    density = {}
+    for result in db[settings.STOCK_DATA_COLLECTION].aggregate(pipeline):
+        first_date = datetime.strptime(str(result["first_date"])[:10], '%Y-%m-%d')
+        last_date = datetime.strptime(str(result["last_date"])[:10], '%Y-%m-%d')
+        density[result["_id"]] = result["rows"] / ((last_date - first_date).days + 1)
+
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    estimates = {}
+    for company in companies_with_dates:
+        start = datetime.strptime(company.get("from_date", company["last_date"]), '%Y-%m-%d')
+        days = max(1, (end - start).days + 1)
+        estimates[company["stock_code"]] = days * density.get(company["stock_code"], DEFAULT_ROWS_PER_DAY)
+    return estimates
+
+
+def balance_shards(companies_with_dates: List[dict], estimates: Dict[str, float], shards: int) -> List[List[dict]]:
+    # Longest-processing-time-first: the heaviest remaining symbol goes to the lightest shard
+    heap = [(0.0, index) for index in range(shards)]
+    assignment = [[] for _ in range(shards)]
+    for company in sorted(companies_with_dates, key=lambda c: estimates[c["stock_code"]], reverse=True):
+        load, index = heapq.heappop(heap)
+        assignment[index].append(company)
+        heapq.heappush(heap, (load + estimates[company["stock_code"]], index))
+    return [shard for shard in assignment if shard]
+
+
+def shard_worker(shard_index: int, companies_with_dates: List[dict], run: dict, shards: int,
+                 parse_workers: int, progress_queue, report_interval: float = 2.0):
+    # Runs in a spawned process: its own Mongo client, event loop, aiohttp session and share of the rate budget
+    metrics = PipelineMetrics()
+    metrics.reset()
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(report_interval)
+            progress_queue.put(("progress", shard_index, metrics.snapshot()))
+
+    async def run_shard() -> bool:
+        db = MongoRepository().database()
+        reporter = asyncio.create_task(report_progress())
+        try:
+            rate_controller = RateController().split(shards)
+            return await store_run_companies(db, companies_with_dates, run, rate_controller, parse_workers)
+        finally:
+            reporter.cancel()
+
+    succeeded = False
+    try:
+        succeeded = asyncio.run(run_shard())
+    except Exception as e:
+        print(f"Shard {shard_index} failed: {e}")
+    progress_queue.put(("done", shard_index, metrics.snapshot(), succeeded))
+
+
+def run_sharded(companies_with_dates: List[dict], shards: int, resume: bool = False) -> bool:
+    db = MongoRepository().database()
+    run = open_run(db, companies_with_dates, resume)
+    estimates = estimate_rows(db, run["companies"], run["end_date"])
+    assignment = balance_shards(run["companies"], estimates, shards)
+    parse_workers = max(1, (os.cpu_count() or 1) // len(assignment))
+
+    # The coordinator owns the run and keeps it alive while the shards work
+    with CheckpointStore(db).keep_alive(run["_id"]):
+        context = multiprocessing.get_context("spawn")
+        progress_queue = context.Queue()
+        workers = []
+        for shard_index, shard in enumerate(assignment):
+            expected = sum(estimates[company["stock_code"]] for company in shard)
+            print(f"Shard {shard_index}: {len(shard)} symbols, ~{expected:.0f} expected rows")
+            worker = context.Process(target=shard_worker, args=(shard_index, shard, run, len(assignment),
+                                                                parse_workers, progress_queue))
+            worker.start()
+            workers.append(worker)
+
+        latest, results = {}, {}
+        last_print = time.time()
+        while len(results) < len(workers):
+            try:
+                message = progress_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers) and progress_queue.empty():
+                    break
+                continue
+            latest[message[1]] = message[2]
+            if message[0] == "done":
+                results[message[1]] = message[3]
+            if time.time() - last_print >= 5:
+                rows = sum(snapshot["counters"].get("rows_written", 0) for snapshot in latest.values())
+                print(f"Progress: {rows:.0f} rows written, {len(results)}/{len(workers)} shards done")
+                last_print = time.time()
+
+        for worker in workers:
+            worker.join()
+
+    metrics = PipelineMetrics()
+    for snapshot in latest.values():
+        metrics.merge(snapshot)
+
+    succeeded = len(results) == len(workers) and all(results.values())
+    finish_run(db, run, succeeded)
+    return succeeded
@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import string
+from datetime import datetime, timedelta
+from typing import Dict, List
+from aiohttp import web
+from table_parsers import TableParserFactory, parse_table
+
+# Local stand-in for www.mse.mk and api.seinet.com.mk, so the ingest pipeline can be benchmarked repeatably.
+# Symbol history comes from recorded pages when available, otherwise from a deterministic synthetic series.
+
+HISTORY_HEADERS = ["Date", "Last trade price", "Max", "Min", "Avg. Price", "%chg.", "Volume",
+                   "Turnover in BEST in denars", "Total turnover in denars"]
+
+
+class StandInConfig:
+    def __init__(self, symbols: int = 140, recordings_dir: str = None, latency_ms: float = 50.0,
+                 latency_jitter_ms: float = 20.0, error_rate: float = 0.0, padding_kb: int = 0,
+                 history_years: int = 10, trade_probability: float = 0.6, news_pages: int = 5, seed: int = 42):
+        self.symbols = symbols
+        self.recordings_dir = recordings_dir
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.padding_kb = padding_kb
+        self.history_years = history_years
+        self.trade_probability = trade_probability
+        self.news_pages = news_pages
+        self.seed = seed
+
+
+class SymbolHistoryStore:
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        self.rows: Dict[str, Dict[datetime, List[str]]] = {}
+        if config.recordings_dir:
+            self._load_recordings(config.recordings_dir)
+        self.symbols = self._symbol_list()
+
+    def _load_recordings(self, recordings_dir: str):
+        backend = TableParserFactory.available_backends()[-1]
+        for file_name in sorted(os.listdir(recordings_dir)):
+            if not file_name.endswith(".html"):
+                continue
+            stock_code = file_name.split("_")[0]
+            with open(os.path.join(recordings_dir, file_name), "r", encoding="utf-8") as file:
+                for cells in parse_table(backend, file.read()):
+                    if len(cells) >= 9:
+                        self.rows.setdefault(stock_code, {})[datetime.strptime(cells[0], "%m/%d/%Y")] = cells
+
+    def _symbol_list(self) -> List[str]:
+        symbols = list(self.rows)
+        if os.path.exists("valid_companies.txt"):
+            with open("valid_companies.txt", "r", encoding="utf-8") as file:
+                symbols += [code for code in file.read().splitlines() if code not in self.rows]
+        generated = ("".join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=4))
+        while len(symbols) < self.config.symbols:
+            code = next(generated)
+            if code not in symbols:
+                symbols.append(code)
+        return symbols[:self.config.symbols]
+
+    def history(self, stock_code: str) -> Dict[datetime, List[str]]:
+        if stock_code not in self.rows:
+            self.rows[stock_code] = self._synthesize(stock_code)
+        return self.rows[stock_code]
+
+    def _synthesize(self, stock_code: str) -> Dict[datetime, List[str]]:
+        rng = random.Random(f"{self.config.seed}:{stock_code}")
+        # Each symbol gets its own liquidity, so the dataset mixes dense and dormant listings like the real exchange
+        trade_probability = self.config.trade_probability * rng.uniform(0.1, 1.5)
+        price = rng.uniform(100, 20000)
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        day = today - timedelta(days=365 * self.config.history_years)
+        rows = {}
+        while day <= today:
+            if day.weekday() < 5 and rng.random() < trade_probability:
+                change = rng.gauss(0, 0.015)
+                previous, price = price, max(1.0, price * (1 + change))
+                high, low = price * (1 + abs(rng.gauss(0, 0.005))), price * (1 - abs(rng.gauss(0, 0.005)))
+                volume = rng.randint(1, 5000)
+                turnover = volume * price
+                rows[day] = [day.strftime("%m/%d/%Y").lstrip("0").replace("/0", "/"), f"{price:,.2f}",
+                             f"{high:,.2f}", f"{low:,.2f}", f"{(high + low) / 2:,.2f}",
+                             f"{(price / previous - 1) * 100:.2f}", f"{volume:,}", f"{turnover:,.0f}",
+                             f"{turnover:,.0f}"]
+            day += timedelta(days=1)
+        return rows
+
+
+class StandInServer:
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        self.store = SymbolHistoryStore(config)
+        self.rng = random.Random(config.seed)
+        self.stats = {"requests": 0, "errors_503": 0, "bytes_sent": 0, "started_at": datetime.now().isoformat()}
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.simulate_network])
+        app.router.add_get("/en/stats/symbolhistory/{stock_code}", self.symbol_history)
+        app.router.add_get("/mk", self.homepage)
+        app.router.add_post("/public/documents", self.documents)
+        app.router.add_get("/public/documents/attachment/{attachment_id}", self.attachment)
+        app.router.add_get("/__stats", self.get_stats)
+        return app
+
+    @web.middleware
+    async def simulate_network(self, request, handler):
+        if request.path == "/__stats":
+            return await handler(request)
+        self.stats["requests"] += 1
+        delay = max(0.0, self.rng.gauss(self.config.latency_ms, self.config.latency_jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if self.rng.random() < self.config.error_rate:
+            self.stats["errors_503"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+        response = await handler(request)
+        self.stats["bytes_sent"] += len(response.body or b"")
+        return response
+
+    def _page(self, body: str) -> web.Response:
+        # Padding mimics the navigation and script weight of the real pages
+        padding = f"<!-- {'x' * 1024 * self.config.padding_kb} -->" if self.config.padding_kb else ""
+        return web.Response(text=f"<html><head><title>MSE</title></head><body>{body}{padding}</body></html>",
+                            content_type="text/html")
+
+    async def symbol_history(self, request) -> web.Response:
+        stock_code = request.match_info["stock_code"]
+        from_date = datetime.strptime(request.query.get("FromDate", "01/01/1990"), "%m/%d/%Y")
+        to_date = datetime.strptime(request.query.get("ToDate", datetime.now().strftime("%m/%d/%Y")), "%m/%d/%Y")
+        history = self.store.history(stock_code)
+        rows = [history[day] for day in sorted(history, reverse=True) if from_date <= day <= to_date]
+
+        options = "".join(f"<option value=\"{code}\">{code}</option>" for code in self.store.symbols)
+        header = "".join(f"<th>{name}</th>" for name in HISTORY_HEADERS)
+        body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+        return self._page(f"<select id=\"Code\">{options}</select>"
+                          f"<table id=\"resultsTable\"><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>")
+
+    async def homepage(self, request) -> web.Response:
+        rows = []
+        for stock_code in self.store.symbols[:10]:
+            history = self.store.history(stock_code)
+            if not history:
+                continue
+            cells = history[max(history)]
+            turnover = cells[8].replace(",", ".")
+            average_price = cells[4].replace(",", " ").replace(".", ",").replace(" ", ".")
+            rows.append(f"<tr><td>{stock_code}</td><td>{average_price}</td><td>{cells[5].replace('.', ',')}</td>"
+                        f"<td>{turnover}</td></tr>")
+        table = "<table><tr><th>Шифра</th><th>Просечна цена</th><th>%пром.</th><th>Промет во БЕСТ</th></tr>" \
+                + "".join(rows) + "</table>"
+        return self._page(f"<div id=\"topSymbolValueTopSymbols\">{table}</div>")
+
+    async def documents(self, request) -> web.Response:
+        payload = await request.json()
+        page = int(payload.get("page", 1))
+        if page > self.config.news_pages:
+            return web.json_response({"data": []})
+        data = []
+        for index in range(10):
+            document_id = page * 100 + index
+            stock_code = self.store.symbols[document_id % len(self.store.symbols)]
+            data.append({
+                "documentId": document_id,
+                "issuer": {"code": stock_code, "localizedTerms": [{"displayName": f"{stock_code} AD Skopje"}]},
+                "layout": {"description": "Other price sensitive information"},
+                "publishedDate": (datetime.now() - timedelta(days=document_id % 365)).strftime("%Y-%m-%dT10:00:00"),
+                "content": f"<p>{stock_code} reported results for the period. " + "Revenue increased. " * 20 + "</p>",
+                "attachments": []
+            })
+        return web.json_response({"data": data})
+
+    async def attachment(self, request) -> web.Response:
+        return web.Response(status=404)
+
+    async def get_stats(self, request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+def run_server(config: StandInConfig, host: str = "127.0.0.1", port: int = 8081):
+    web.run_app(StandInServer(config).create_app(), host=host, port=port, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for mse.mk and the seinet documents API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--symbols", type=int, default=140)
+    parser.add_argument("--recordings", help="Directory of saved symbolhistory pages named <CODE>_*.html")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--padding-kb", type=int, default=0, help="Extra KB added to every HTML page")
+    parser.add_argument("--history-years", type=int, default=10)
+    args = parser.parse_args()
+
+    config = StandInConfig(symbols=args.symbols, recordings_dir=args.recordings, latency_ms=args.latency_ms,
+                           latency_jitter_ms=args.latency_jitter_ms, error_rate=args.error_rate,
+                           padding_kb=args.padding_kb, history_years=args.history_years)
+    print(f"Serving stand-in on http://{args.host}:{args.port} ({json.dumps(vars(args))})")
+    run_server(config, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
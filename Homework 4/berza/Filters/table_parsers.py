@@ -0,0 +1,63 @@
+from typing import Dict, List
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+
+# Strategy Pattern for extracting the symbol history table into rows of cell strings
+class TableParser:
+    def parse(self, html: str) -> List[List[str]]:
+        raise NotImplementedError("Subclasses must implement the `parse` method.")
+
+
+class SoupTableParser(TableParser):
+    def parse(self, html: str) -> List[List[str]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        table_body = soup.find('tbody')
+        if not table_body:
+            return []
+        return [[cell.text.strip() for cell in row.find_all('td')] for row in table_body.find_all('tr')]
+
+
+class LxmlTableParser(TableParser):
+    def parse(self, html: str) -> List[List[str]]:
+        if not html.strip():
+            return []
+        table_bodies = lxml_html.fromstring(html).xpath('//tbody')
+        if not table_bodies:
+            return []
+        return [[cell.text_content().strip() for cell in row.xpath('./td')] for row in table_bodies[0].xpath('./tr')]
+
+
+# Factory Pattern for Table Parsers
+class TableParserFactory:
+    @staticmethod
+    def available_backends() -> List[str]:
+        backends = ["html.parser"]
+        if lxml_html is not None:
+            backends.append("lxml")
+        return backends
+
+    @staticmethod
+    def create_parser(backend: str = "lxml") -> TableParser:
+        if backend == "lxml":
+            if lxml_html is not None:
+                return LxmlTableParser()
+            print("lxml is not installed, falling back to html.parser.")
+            return SoupTableParser()
+        if backend == "html.parser":
+            return SoupTableParser()
+        raise ValueError(f"No table parser available for backend: {backend}")
+
+
+_parsers: Dict[str, TableParser] = {}
+
+
+def parse_table(backend: str, html: str) -> List[List[str]]:
+    # Module-level entry point so it can be shipped to a ProcessPoolExecutor worker
+    if backend not in _parsers:
+        _parsers[backend] = TableParserFactory.create_parser(backend)
+    return _parsers[backend].parse(html)
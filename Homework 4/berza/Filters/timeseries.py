@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from pymongo import ASCENDING
+
+# The shared modules (settings, schema, ...) live in the project root next to main_api.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_cache import DataVersions
+from repository import MongoRepository
+from row_batches import RowBatch
+import schema
+
+
+# Time-series storage backend for price bars (STOCK_DATA_BACKEND=timeseries).
+# MongoDB groups the bars of one company_name into compressed buckets ordered by date,
+# so per-symbol range reads touch a few buckets instead of scattered documents.
+def create_timeseries_collection(db, name: str):
+    if name not in db.list_collection_names():
+        # Daily bars: "hours" granularity gives buckets of about a month of trading days
+        db.create_collection(name, timeseries={"timeField": "date", "metaField": "company_name",
+                                               "granularity": "hours"})
+        print(f"Created time-series collection {name}.")
+    db[name].create_index([("company_name", ASCENDING), ("date", ASCENDING)])
+
+
+# Time-series collections have no unique indexes and no upserts, so a batch replaces its days instead:
+# delete the symbol's bars on those dates, insert, then drop duplicates left by a concurrent writer.
+# Re-running a window stays idempotent.
+class TimeSeriesWriter:
+    def __init__(self, mongo_collection):
+        self.collection = mongo_collection
+        self._indexed = False
+
+    def ensure_indexes(self):
+        if not self._indexed:
+            create_timeseries_collection(self.collection.database, self.collection.name)
+            self._indexed = True
+
+    def write(self, batch: RowBatch) -> int:
+        if not len(batch):
+            return 0
+        return MongoRepository().replace_bars(batch.company_name, batch.to_documents(), self.collection)
+
+
+def migrate_to_timeseries(db, source: str, target: str, batch_size: int = 5000) -> int:
+    # Copies bars in _id order; progress is stored so an interrupted copy continues where it stopped
+    create_timeseries_collection(db, target)
+    progress = db["migrations"]
+    progress_id = f"timeseries:{source}:{target}"
+    state = progress.find_one({"_id": progress_id}) or {}
+    last_id = state.get("last_id")
+    copied = state.get("copied", 0)
+    skipped = state.get("skipped", 0)
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(db[source].find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        documents = {}
+        for document in batch:
+            # Legacy documents are typed on the way, the timeField has to be a BSON date
+            bar = {key: value for key, value in document.items() if key != "_id"}
+            try:
+                bar.update(schema.typed_fields(document))
+            except (KeyError, ValueError):
+                # Like schema.migrate, a document without a usable date is left behind and counted
+                skipped += 1
+                continue
+            documents.setdefault(bar["company_name"], []).append(bar)
+        # Replacing the batch's days instead of inserting keeps a batch that is copied again after a crash
+        # (before its progress was saved) from leaving duplicates behind
+        for stock_code, bars in documents.items():
+            copied += MongoRepository().replace_bars(stock_code, bars, db[target])
+        DataVersions().bump_all(documents)
+        last_id = batch[-1]["_id"]
+        progress.update_one({"_id": progress_id},
+                            {"$set": {"last_id": last_id, "copied": copied, "skipped": skipped,
+                                      "updated_at": datetime.now()}},
+                            upsert=True)
+        print(f"Copied {copied} bars into {target}.")
+    if skipped:
+        print(f"Skipped {skipped} documents without a valid date.")
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy stock_data into a MongoDB time-series collection.")
+    parser.add_argument("--source", default="stock_data")
+    parser.add_argument("--target", default="stock_bars")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    db = MongoRepository().database()
+    start_time = time.time()
+    copied = migrate_to_timeseries(db, args.source, args.target, args.batch_size)
+    source_count = db[args.source].count_documents({})
+    target_count = db[args.target].count_documents({})
+    print(f"Copied {copied} bars in {time.time() - start_time:.1f} seconds "
+          f"({args.source}: {source_count}, {args.target}: {target_count}).")
+    if source_count == target_count:
+        print(f"Set STOCK_DATA_BACKEND=timeseries (and STOCK_DATA_COLLECTION={args.target}) to switch over.")
+    else:
+        print("Counts differ; bars written during the copy are picked up by running the migration again.")
+
+
+if __name__ == "__main__":
+    main()
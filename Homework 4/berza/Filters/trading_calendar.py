@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List
+import settings
+
+# Fixed-date public holidays in North Macedonia on which the Macedonian Stock Exchange does not trade
+FIXED_HOLIDAYS = [(1, 1), (1, 2), (1, 7), (5, 1), (5, 24), (8, 2), (9, 8), (10, 11), (10, 23), (12, 8)]
+
+
+def orthodox_easter(year: int) -> date:
+    # Meeus' Julian algorithm, shifted to the Gregorian calendar (valid 1900-2099)
+    a, b, c = year % 4, year % 7, year % 19
+    d = (19 * c + 15) % 30
+    e = (2 * a + 4 * b - d + 34) % 7
+    month, day = divmod(d + e + 114, 31)
+    return date(year, month, day + 1) + timedelta(days=13)
+
+
+@lru_cache(maxsize=256)
+def holidays_in(year: int, extra_holidays: FrozenSet[date] = frozenset()) -> FrozenSet[date]:
+    days = set()
+    for month, day in FIXED_HOLIDAYS:
+        holiday = date(year, month, day)
+        days.add(holiday)
+        # A holiday that falls on a Sunday moves the day off to Monday
+        if holiday.weekday() == 6:
+            days.add(holiday + timedelta(days=1))
+    days.add(orthodox_easter(year) + timedelta(days=1))
+    days.update(holiday for holiday in extra_holidays if holiday.year == year)
+    return frozenset(days)
+
+
+class TradingCalendar:
+    def __init__(self, extra_holidays: Iterable[date] = None):
+        self.extra_holidays = frozenset(extra_holidays or [])
+
+    def holidays(self, year: int) -> FrozenSet[date]:
+        # Cached per (year, extra holidays) at module level, so calendars do not stay alive in the cache
+        return holidays_in(year, self.extra_holidays)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def trading_days(self, start: date, end: date) -> List[date]:
+        days = []
+        day = start
+        while day <= end:
+            if self.is_trading_day(day):
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+
+def default_calendar() -> TradingCalendar:
+    # Moving closures (e.g. the first day of Eid al-Fitr) come from MSE_EXTRA_HOLIDAYS=YYYY-MM-DD,YYYY-MM-DD
+    return TradingCalendar(date.fromisoformat(day) for day in settings.MSE_EXTRA_HOLIDAYS)
@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Dict, List
+import settings
+
+
+# Repository Pattern for per-symbol ingest watermarks
+# One document per symbol: {"_id": stock_code, "last_date": "YYYY-MM-DD"} holding the last stored bar.
+class WatermarkStore:
+    def __init__(self, db, collection_name: str = "watermarks", data_collection_name: str = None):
+        self.collection = db[collection_name]
+        self.data_collection = db[data_collection_name or settings.STOCK_DATA_COLLECTION]
+
+    def get_many(self, stock_codes: List[str]) -> Dict[str, str]:
+        cursor = self.collection.find({"_id": {"$in": stock_codes}}, {"last_date": 1})
+        watermarks = {doc["_id"]: doc["last_date"] for doc in cursor}
+
+        missing = [stock_code for stock_code in stock_codes if stock_code not in watermarks]
+        if missing:
+            watermarks.update(self._bootstrap(missing))
+        return watermarks
+
+    def _bootstrap(self, stock_codes: List[str]) -> Dict[str, str]:
+        # Seed watermarks once from bars that were stored before the watermark collection existed
+        pipeline = [
+            {"$match": {"company_name": {"$in": stock_codes}}},
+            {"$group": {"_id": "$company_name", "last_date": {"$max": "$date"}}}
+        ]
+        found = {}
+        for result in self.data_collection.aggregate(pipeline):
+            if result["last_date"]:
+                # Bars store a datetime since schema v2; watermarks keep the "YYYY-MM-DD" form
+                last_date = str(result["last_date"])[:10]
+                found[result["_id"]] = last_date
+                self.advance(result["_id"], last_date)
+        return found
+
+    def advance(self, stock_code: str, last_date: str):
+        # $max keeps the update atomic and monotonic, so concurrent or replayed batches never move it back
+        self.collection.update_one(
+            {"_id": stock_code},
+            {"$max": {"last_date": last_date}, "$set": {"updated_at": datetime.now()}},
+            upsert=True
+        )
@@ -1,48 +1,21 @@
 import os
-import pandas as pd
 import numpy as np
-from pymongo import MongoClient
 from sklearn.preprocessing import MinMaxScaler
 from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense
 from tensorflow.keras.optimizers import Adam
 import matplotlib.pyplot as plt
 from datetime import datetime
+from frame_cache import CachedBarLoader
 
 
 class LSTMFactory:
     def __init__(self):
-        self.client = MongoClient("mongodb://mongo:27017/")
-        self.db = self.client["stocks_db"]
-        self.collection = self.db["stock_data"]
+        self.loader = CachedBarLoader()
 
     def fetch_stock_data(self, stock_code):
-        cursor = self.collection.find(
-            {'company_name': stock_code},
-            {'_id': 0, 'date': 1, 'last_trade_price': 1, 'min_price': 1, 'max_price': 1, 'volume': 1}
-        )
-        data = pd.DataFrame(list(cursor))
-
-        def clean_data(value):
-            if isinstance(value, str):
-                value = value.replace(',', '.')
-                if value.count('.') > 1:
-                    value = value.replace('.', '', value.count('.') - 1)
-                try:
-                    return float(value)
-                except ValueError:
-                    return np.nan
-            return value
-
-        data['last_trade_price'] = data['last_trade_price'].apply(clean_data)
-        data['min_price'] = data['min_price'].apply(clean_data)
-        data['max_price'] = data['max_price'].apply(clean_data)
-        data['volume'] = data['volume'].apply(clean_data)
-
-        data['date'] = pd.to_datetime(data['date'], dayfirst=False)
+        data = self.loader.load(stock_code, fields=['last_trade_price', 'min_price', 'max_price', 'volume'])
         data.set_index('date', inplace=True)
-        data.sort_index(ascending=True, inplace=True)
-
         return data
 
     def preprocess_data(self, stock_data):
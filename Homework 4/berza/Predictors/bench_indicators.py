@@ -0,0 +1,116 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Run from anywhere: the project root holds the shared modules, Filters the stand-in exchange
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Filters"))
+
+from Predictors.indicators import compute_indicators
+from row_batches import RowBatch
+from standin_server import StandInConfig, SymbolHistoryStore
+
+
+def calculate_with_apply(data: pd.DataFrame) -> pd.DataFrame:
+    # The previous calculate_indicators: pandas rolling/ewm, then a Python call per row for every signal
+    close = data['last_trade_price']
+    delta = close.diff()
+    avg_gain = delta.where(delta > 0, 0).rolling(window=14, min_periods=1).mean()
+    avg_loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
+    data['RSI'] = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    low_min = data['min_price'].rolling(window=14).min()
+    high_max = data['max_price'].rolling(window=14).max()
+    data['STOCH_K'] = 100 * ((close - low_min) / (high_max - low_min))
+    data['STOCH_D'] = data['STOCH_K'].rolling(window=3).mean()
+
+    data['MACD'] = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    data['MACD_SIGNAL'] = data['MACD'].ewm(span=9, adjust=False).mean()
+    data['SMA'] = close.rolling(window=30).mean()
+    data['EMA'] = close.ewm(span=30, adjust=False).mean()
+
+    data['RSI_SIGNAL'] = data['RSI'].apply(lambda x: 'BUY' if x < 30 else ('SELL' if x > 70 else 'HOLD'))
+    data['STOCH_SIGNAL'] = data['STOCH_K'].apply(lambda x: 'BUY' if x < 20 else ('SELL' if x > 80 else 'HOLD'))
+    data['MACD_SIGNAL'] = data['MACD'].apply(lambda x: 'BUY' if x > 0 else 'SELL')
+    data['SMA_SIGNAL'] = data.apply(lambda row: 'BUY' if row['last_trade_price'] > row['SMA'] else ('SELL' if row['last_trade_price'] < row['SMA'] else 'HOLD'), axis=1)
+    data['EMA_SIGNAL'] = data.apply(lambda row: 'BUY' if row['last_trade_price'] > row['EMA'] else ('SELL' if row['last_trade_price'] < row['EMA'] else 'HOLD'), axis=1)
+    return data
+
+
+def calculate_with_engine(data: pd.DataFrame, latest_only: bool = False) -> pd.DataFrame:
+    values = compute_indicators(data['last_trade_price'].to_numpy(), data['min_price'].to_numpy(),
+                                data['max_price'].to_numpy(), latest_only)
+    data = data.iloc[-1:] if latest_only else data
+    return pd.concat([data, pd.DataFrame(values, index=data.index)], axis=1)
+
+
+def two_year_frames(symbols: int):
+    # Liquid symbols that trade on every weekday, about 520 bars each
+    store = SymbolHistoryStore(StandInConfig(symbols=symbols, history_years=2, trade_probability=10.0))
+    frames = {}
+    for stock_code in store.symbols:
+        batch = RowBatch.from_cells(list(store.history(stock_code).values()), stock_code)
+        frame = pd.DataFrame({"date": batch.dates, **{field: batch.columns[field] for field in
+                                                      ["last_trade_price", "min_price", "max_price", "volume"]}})
+        frames[stock_code] = frame.sort_values("date").set_index("date")
+    return frames
+
+
+def check_equal(frame: pd.DataFrame):
+    # The engine has to give the same signals and, up to rounding, the same values as the apply version
+    expected = calculate_with_apply(frame.copy())
+    actual = calculate_with_engine(frame.copy())
+    latest = calculate_with_engine(frame.copy(), latest_only=True)
+    for column in ["RSI", "STOCH_K", "STOCH_D", "MACD", "SMA", "EMA"]:
+        pd.testing.assert_series_equal(actual[column], expected[column], check_dtype=False, rtol=1e-9)
+        pd.testing.assert_series_equal(latest[column], expected[column].iloc[-1:], check_dtype=False, rtol=1e-9)
+    for column in ["RSI_SIGNAL", "STOCH_SIGNAL", "MACD_SIGNAL", "SMA_SIGNAL", "EMA_SIGNAL"]:
+        assert (actual[column].astype(str) == expected[column].astype(str)).all(), column
+        assert str(latest[column].iloc[-1]) == str(expected[column].iloc[-1]), column
+
+
+def bench(name: str, calculate, frames: dict, repeat: int):
+    one = next(iter(frames.values()))
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        calculate(one.copy())
+        timings.append(time.perf_counter() - start_time)
+
+    copies = [frame.copy() for frame in frames.values()]
+    start_time = time.perf_counter()
+    for frame in copies:
+        calculate(frame)
+    total = time.perf_counter() - start_time
+    print(f"{name:<22} one symbol ({len(one)} bars) median {statistics.median(timings) * 1000:8.3f} ms   "
+          f"all {len(frames)} symbols {total * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call latency of the TechnicalAnalysis indicators "
+                                                 "on two years of daily bars.")
+    parser.add_argument("--symbols", type=int, default=140)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    frames = two_year_frames(args.symbols)
+    for frame in frames.values():
+        check_equal(frame)
+        # Days without a parsable close: the EMAs have to keep pandas' NaN handling, not just skip the gap
+        gapped = frame.copy()
+        gapped.iloc[[40, 41, 200], gapped.columns.get_loc('last_trade_price')] = np.nan
+        check_equal(gapped)
+    print(f"Engine output matches the apply version on all {len(frames)} symbols, with and without NaN closes.")
+
+    bench("pandas + apply", calculate_with_apply, frames, args.repeat)
+    bench("NumPy engine", calculate_with_engine, frames, args.repeat)
+    bench("NumPy engine, latest", lambda frame: calculate_with_engine(frame, latest_only=True), frames, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import argparse
+import math
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Optional
+from bar_loader import BarLoaderFactory
+from frame_cache import DataVersions
+from repository import MongoRepository
+from Predictors.indicators import (EMA_PERIOD, MACD_LONG, MACD_SHORT, RSI_PERIOD, SMA_PERIOD, STOCH_PERIOD,
+                                   STOCH_SMOOTHING)
+import schema
+import settings
+
+# analyze_stock looks at the last two years of bars
+ANALYSIS_DAYS = 365 * 2
+# The rolling indicators only match analyze_stock's when its window holds all the bars they look back on
+# (RSI needs one more for its first difference), or when the window starts at the symbol's first bar
+MIN_WINDOW_BARS = max(RSI_PERIOD + 1, STOCH_PERIOD, SMA_PERIOD)
+# States of another layout are rebuilt instead of read
+STATE_FORMAT = 2
+
+
+def divide(numerator: float, denominator: float) -> float:
+    # NumPy float division: x / 0 is +-inf and 0 / 0 is NaN instead of an exception
+    if denominator == 0:
+        return math.nan if numerator == 0 or math.isnan(numerator) else math.copysign(math.inf, numerator)
+    return numerator / denominator
+
+
+# Sliding window with a running sum: O(1) per bar. NaNs count as missing, like in pandas rolling().
+class RollingWindow:
+    def __init__(self, window: int, values=None):
+        self.window = window
+        self.values = deque(values or [], maxlen=window)
+        self.total = math.fsum(value for value in self.values if not math.isnan(value))
+        self.nans = sum(1 for value in self.values if math.isnan(value))
+
+    def push(self, value: float):
+        if len(self.values) == self.window:
+            dropped = self.values[0]
+            if math.isnan(dropped):
+                self.nans -= 1
+            else:
+                self.total -= dropped
+        self.values.append(value)
+        if math.isnan(value):
+            self.nans += 1
+        else:
+            self.total += value
+
+    def mean(self) -> float:
+        # rolling(window).mean(): needs a full window without NaNs
+        if len(self.values) < self.window or self.nans:
+            return math.nan
+        return self.total / self.window
+
+    def partial_mean(self) -> float:
+        # rolling(window, min_periods=1).mean() over a window that never holds NaNs
+        return self.total / len(self.values) if self.values else math.nan
+
+    def to_document(self) -> list:
+        return list(self.values)
+
+
+# Minimum or maximum over a sliding window with a monotonic deque of (bar index, value): amortized O(1) per bar
+class ExtremeWindow:
+    def __init__(self, window: int, largest: bool, items=None, last_nan: int = -1, index: int = -1):
+        self.window = window
+        self.largest = largest
+        self.items = deque(tuple(item) for item in (items or []))
+        self.last_nan = last_nan
+        self.index = index
+
+    def push(self, value: float):
+        self.index += 1
+        if math.isnan(value):
+            self.last_nan = self.index
+        else:
+            while self.items and (self.items[-1][1] <= value if self.largest else self.items[-1][1] >= value):
+                self.items.pop()
+            self.items.append((self.index, value))
+        while self.items and self.items[0][0] <= self.index - self.window:
+            self.items.popleft()
+
+    def value(self) -> float:
+        # rolling(window).min()/max(): NaN until the window is full or while it holds a NaN
+        if self.index + 1 < self.window or self.last_nan > self.index - self.window or not self.items:
+            return math.nan
+        return self.items[0][1]
+
+    def to_document(self) -> dict:
+        return {"items": [list(item) for item in self.items], "last_nan": self.last_nan, "index": self.index}
+
+
+# ewm(span, adjust=False).mean() of the closes in a sliding window, with pandas' NaN handling as in
+# Predictors/indicators.ema: it starts at the window's first valid close, a NaN keeps the last value, and the first
+# input after gap NaNs is weighted against it with (1 - alpha) ** (gap + 1).
+# Every step carries the previous value on with a factor (1 - alpha, or w / (w + alpha) after a gap), so the value
+# is linear in the closes; carry is the product of the factors since the first close. When that close x_s leaves
+# the window, restarting at the next valid close x_n changes the value by exactly carry * (x_s - x_n).
+class WindowEma:
+    def __init__(self, span: int, value: float = None, gap: int = 0, carry: float = 1.0):
+        self.alpha = 2.0 / (span + 1)
+        self.value = value
+        self.gap = gap
+        self.carry = carry
+
+    def push(self, value: float) -> float:
+        if math.isnan(value):
+            if self.value is not None:
+                self.gap += 1
+        elif self.value is None:
+            self.value = value
+            self.carry = 1.0
+        elif not self.gap:
+            self.value = (1 - self.alpha) * self.value + self.alpha * value
+            self.carry *= 1 - self.alpha
+        else:
+            weight = (1 - self.alpha) ** (self.gap + 1)
+            self.value = (weight * self.value + self.alpha * value) / (weight + self.alpha)
+            self.carry *= weight / (weight + self.alpha)
+            self.gap = 0
+        return self.value if self.value is not None else math.nan
+
+    def drop(self, dropped: float, closes):
+        # dropped left the window, closes are the ones still in it. Only a valid close starts the EMA, and the
+        # window's first valid close is always the one that leaves first.
+        if math.isnan(dropped) or self.value is None:
+            return
+        for position, close in enumerate(closes):
+            if not math.isnan(close):
+                weight = (1 - self.alpha) ** (position + 1)
+                self.value -= self.carry * (dropped - close)
+                self.carry /= weight / (weight + self.alpha)
+                return
+        self.value, self.gap, self.carry = None, 0, 1.0
+
+    def to_document(self) -> dict:
+        return {"value": self.value, "gap": self.gap, "carry": self.carry}
+
+
+# Everything analyze_stock needs from a symbol's history, updated in constant time per new bar
+class IndicatorState:
+    def __init__(self, stock_code: str, document: dict = None):
+        document = document or {}
+        self.stock_code = stock_code
+        self.version = document.get("version", 0)
+        self.first_date = document.get("first_date")
+        self.last_date = document.get("last_date")
+        self.bars = document.get("bars", 0)
+        self.previous_close = document.get("previous_close", math.nan)
+        self.last_close = document.get("last_close", math.nan)
+        self.gains = RollingWindow(RSI_PERIOD, document.get("gains"))
+        self.losses = RollingWindow(RSI_PERIOD, document.get("losses"))
+        self.closes = RollingWindow(SMA_PERIOD, document.get("closes"))
+        self.lows = ExtremeWindow(STOCH_PERIOD, False, **document.get("lows", {}))
+        self.highs = ExtremeWindow(STOCH_PERIOD, True, **document.get("highs", {}))
+        self.stoch_k = RollingWindow(STOCH_SMOOTHING, document.get("stoch_k"))
+        # The EMAs only cover the bars in dates, like analyze_stock's which start at its window
+        self.ema_short = WindowEma(MACD_SHORT, **document.get("ema_short", {}))
+        self.ema_long = WindowEma(MACD_LONG, **document.get("ema_long", {}))
+        self.ema = WindowEma(EMA_PERIOD, **document.get("ema", {}))
+        # Dates and closes of the bars of the last ANALYSIS_DAYS, to find where analyze_stock's window starts
+        self.dates = deque(document.get("dates", []))
+        self.window_closes = deque(document.get("window_closes", []))
+        # The state before the last bar, without the window: a re-fetched last day (a partial intraday bar, or a
+        # corrected one) replaces that bar. dropped holds the bars the last one pushed out of the window.
+        self.before_last = document.get("before_last")
+        self.dropped = document.get("dropped", [])
+
+    def advance(self, rows):
+        # rows: (date, close, low, high) in date order, all after the state's last date
+        rows = list(rows)
+        for row in rows[:-1]:
+            self.update(*row)
+        if rows:
+            self.before_last = self.indicators_document()
+            self.dropped = self.update(*rows[-1])
+
+    def before_last_state(self) -> "IndicatorState":
+        # The window is the current one without the last bar and with the bars that bar pushed out again
+        dates = [date for date, _ in self.dropped] + list(self.dates)[:-1]
+        closes = [close for _, close in self.dropped] + list(self.window_closes)[:-1]
+        return IndicatorState(self.stock_code, {**self.before_last, "dates": dates, "window_closes": closes})
+
+    def update(self, date: datetime, close: float, low: float, high: float) -> list:
+        # Returns the (date, close) bars that left the window
+        delta = close - self.previous_close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        self.previous_close = close
+        self.last_close = close
+        self.closes.push(close)
+
+        self.lows.push(low)
+        self.highs.push(high)
+        low_min, high_max = self.lows.value(), self.highs.value()
+        self.stoch_k.push(100 * divide(close - low_min, high_max - low_min))
+
+        for ema in (self.ema_short, self.ema_long, self.ema):
+            ema.push(close)
+
+        self.bars += 1
+        self.first_date = self.first_date or date
+        self.last_date = date
+        self.dates.append(date)
+        self.window_closes.append(close)
+        return self.narrow(date - timedelta(days=ANALYSIS_DAYS))
+
+    def narrow(self, start: datetime) -> list:
+        # Drops the bars before start from the window and the EMAs
+        dropped = []
+        while self.dates and self.dates[0] < start:
+            date, close = self.dates.popleft(), self.window_closes.popleft()
+            for ema in (self.ema_short, self.ema_long, self.ema):
+                ema.drop(close, self.window_closes)
+            dropped.append((date, close))
+        return dropped
+
+    def macd(self) -> float:
+        short, long = self.ema_short.value, self.ema_long.value
+        return short - long if short is not None else math.nan
+
+    def rsi(self) -> float:
+        return 100 - divide(100, 1 + divide(self.gains.partial_mean(), self.losses.partial_mean()))
+
+    def window_start(self, start: datetime) -> Optional[datetime]:
+        # Narrows the window to the bars on or after start; its first bar, if the state can answer for it
+        self.narrow(start)
+        if not self.dates or (self.dates[0] != self.first_date and len(self.dates) < MIN_WINDOW_BARS):
+            return None
+        return self.dates[0]
+
+    def indicators_document(self) -> dict:
+        # Everything but the window: a few windows of at most SMA_PERIOD values
+        return {"format": STATE_FORMAT, "version": self.version, "first_date": self.first_date,
+                "last_date": self.last_date,
+                "bars": self.bars, "previous_close": self.previous_close, "last_close": self.last_close,
+                "gains": self.gains.to_document(), "losses": self.losses.to_document(),
+                "closes": self.closes.to_document(), "lows": self.lows.to_document(),
+                "highs": self.highs.to_document(), "stoch_k": self.stoch_k.to_document(),
+                "ema_short": self.ema_short.to_document(), "ema_long": self.ema_long.to_document(),
+                "ema": self.ema.to_document()}
+
+    def to_document(self) -> dict:
+        # About 15 KB per symbol, most of it the ~500 dates and closes of the last two years; written once per
+        # stored batch (one per symbol on a daily run), not once per bar
+        return {"_id": self.stock_code, **self.indicators_document(), "dates": list(self.dates),
+                "window_closes": list(self.window_closes), "before_last": self.before_last,
+                "dropped": [list(bar) for bar in self.dropped], "updated_at": datetime.now()}
+
+
+# Repository Pattern for the persisted indicator states, kept current by the ingest events
+class IndicatorStateStore:
+    # One update per symbol at a time, so out-of-order window flushes cannot interleave
+    _locks = defaultdict(threading.Lock)
+
+    def __init__(self, repository: MongoRepository = None):
+        self.repository = repository or MongoRepository()
+        self.versions = DataVersions(self.repository)
+
+    def collection(self):
+        return self.repository.collection(settings.INDICATOR_STATE_COLLECTION)
+
+    def get(self, stock_code: str) -> Optional[IndicatorState]:
+        document = self.collection().find_one({"_id": stock_code})
+        if not document or document.get("format") != STATE_FORMAT:
+            return None
+        return IndicatorState(stock_code, document)
+
+    def save(self, state: IndicatorState):
+        self.collection().replace_one({"_id": state.stock_code}, state.to_document(), upsert=True)
+
+    def rebuild(self, stock_code: str, version: int = None) -> IndicatorState:
+        # O(history): used for a symbol's first state and whenever bars arrive before the state's last date
+        state = IndicatorState(stock_code)
+        state.advance(self._stored_rows(stock_code))
+        state.version = version if version is not None else self.versions.get(stock_code)
+        self.save(state)
+        return state
+
+    def _stored_rows(self, stock_code: str, start=None, end=None):
+        bars = BarLoaderFactory.create_loader(self.repository).load(
+            stock_code, start, end, fields=["last_trade_price", "min_price", "max_price"])
+        return zip(bars['date'].dt.to_pydatetime().tolist(), bars['last_trade_price'].tolist(),
+                   bars['min_price'].tolist(), bars['max_price'].tolist())
+
+    @staticmethod
+    def _batch_rows(batch):
+        order = batch.dates.argsort(kind="stable")
+        return zip(batch.dates[order].astype("datetime64[ms]").tolist(),
+                   batch.columns["last_trade_price"][order].tolist(),
+                   batch.columns["min_price"][order].tolist(), batch.columns["max_price"][order].tolist())
+
+    def on_bars_written(self, event):
+        with self._locks[event.stock_code]:
+            state = self.get(event.stock_code)
+            first_date = schema.to_date(event.first_date)
+            version = max(event.version, state.version if state else 0)
+            if state is not None and first_date == state.last_date and state.before_last is not None:
+                # Filter2 starts every run at the last stored day, so that bar is replaced, not appended
+                state = state.before_last_state()
+            elif state is None or first_date <= state.last_date:
+                # Bars before the state's last one change everything after them
+                self.rebuild(event.stock_code, version)
+                return
+            # Other processes only publish a summary, so their bars are read back from the store
+            rows = self._batch_rows(event.batch) if event.batch is not None else \
+                self._stored_rows(event.stock_code, event.first_date, event.last_date)
+            state.advance(rows)
+            state.version = version
+            self.save(state)
+
+    def analysis(self, stock_code: str, end_date: datetime) -> Optional[dict]:
+        # analyze_stock's answer from the state, or None when only the history can give the exact same one
+        state = self.get(stock_code)
+        if state is None or state.version != self.versions.get(stock_code) or state.last_date > end_date:
+            return None
+        window_start = state.window_start(end_date - timedelta(days=ANALYSIS_DAYS))
+        if window_start is None:
+            return None
+
+        close, sma, ema, macd = state.last_close, state.closes.mean(), state.ema.value, state.macd()
+        if ema is None:
+            # Only NaN closes in the window
+            return None
+        rsi, stoch = state.rsi(), state.stoch_k.values[-1]
+        return {
+            "stock_code": stock_code,
+            "date_range": f"{window_start.strftime('%d.%m.%Y')} - {state.last_date.strftime('%d.%m.%Y')}",
+            "last_price": float(close),
+            "SMA_1": float(sma),
+            "EMA_1": float(ema),
+            "RSI": float(rsi),
+            "MACD": float(macd),
+            "STOCH": float(stoch),
+            "RSI_SIGNAL": level_signal(rsi, 30, 70),
+            "STOCH_SIGNAL": level_signal(stoch, 20, 80),
+            "MACD_SIGNAL": "BUY" if macd > 0 else "SELL",
+            "SMA_SIGNAL": trend_signal(close, sma),
+            "EMA_SIGNAL": trend_signal(close, ema)
+        }
+
+
+def level_signal(value: float, buy_below: float, sell_above: float) -> str:
+    return "BUY" if value < buy_below else ("SELL" if value > sell_above else "HOLD")
+
+
+def trend_signal(close: float, average: float) -> str:
+    return "BUY" if close > average else ("SELL" if close < average else "HOLD")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the persisted indicator states from the stored bars.")
+    parser.add_argument("stock_codes", nargs="*", help="Symbols to rebuild (default: every symbol with bars)")
+    args = parser.parse_args()
+
+    store = IndicatorStateStore()
+    stock_codes = args.stock_codes or sorted(store.repository.bars_collection().distinct("company_name"))
+    for stock_code in stock_codes:
+        state = store.rebuild(stock_code)
+        print(f"{stock_code}: {state.bars} bars up to {state.last_date}")
+
+
+if __name__ == "__main__":
+    main()
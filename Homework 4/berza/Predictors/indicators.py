@@ -0,0 +1,166 @@
+from functools import lru_cache
+from typing import Dict, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# NumPy kernels for the TechnicalAnalysis indicators. Results match the pandas rolling/ewm versions they replaced
+# (kept as the baseline in bench_indicators.py) bar for bar, NaN closes included; the signals come from array
+# selects instead of per-row apply calls.
+RSI_PERIOD = 14
+STOCH_PERIOD = 14
+STOCH_SMOOTHING = 3
+MACD_SHORT, MACD_LONG, MACD_SIGNAL = 12, 26, 9
+SMA_PERIOD = 30
+EMA_PERIOD = 30
+EMA_BLOCK = 64
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    # Like pandas rolling(window).sum(): NaN until the window is full, and NaN wherever it holds a NaN
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).sum(axis=1)
+    return result
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    return rolling_sum(values, window) / window
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).min(axis=1)
+    return result
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).max(axis=1)
+    return result
+
+
+@lru_cache(maxsize=None)
+def ema_weights(span: int, block: int) -> Tuple[np.ndarray, np.ndarray]:
+    # weights[j, k] = alpha * (1 - alpha)^(j - k) for k <= j, carry[j] = (1 - alpha)^(j + 1)
+    alpha = 2.0 / (span + 1)
+    lags = np.subtract.outer(np.arange(block), np.arange(block))
+    weights = np.where(lags >= 0, alpha * (1 - alpha) ** np.maximum(lags, 0), 0.0)
+    return weights, (1 - alpha) ** np.arange(1, block + 1)
+
+
+def ema_run(series: np.ndarray, span: int, first: float) -> np.ndarray:
+    # y[0] = first, y[t] = (1 - alpha) * y[t - 1] + alpha * x[t] over a run without NaNs.
+    # The recurrence runs block-wise: one matrix product for the terms inside every block of EMA_BLOCK bars,
+    # then a carry of the previous block's last value, so the Python loop has len / EMA_BLOCK steps.
+    weights, carry = ema_weights(span, EMA_BLOCK)
+    padded = np.zeros(-(-len(series) // EMA_BLOCK) * EMA_BLOCK)
+    padded[:len(series)] = series
+    # alpha * first + (1 - alpha) * first is the first value again
+    padded[0] = first
+    blocks = padded.reshape(-1, EMA_BLOCK) @ weights.T
+    previous = first
+    for block in blocks:
+        block += carry * previous
+        previous = block[-1]
+    result = blocks.ravel()[:len(series)]
+    # ...up to an ulp; the first value is set exactly, as in pandas
+    result[0] = first
+    return result
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    # ewm(span, adjust=False).mean(), NaNs included: leading NaNs stay NaN, a NaN later on keeps the last value,
+    # and the first close after k NaNs is weighted against it with (1 - alpha) ** (k + 1), not (1 - alpha).
+    # Every run of valid closes goes through the block kernel, so the loop below has one step per gap.
+    alpha = 2.0 / (span + 1)
+    result = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    previous, previous_end = None, None
+    for run in np.split(valid, np.flatnonzero(np.diff(valid) > 1) + 1) if len(valid) else []:
+        start, end = run[0], run[-1] + 1
+        if previous is None:
+            first = values[start]
+        else:
+            result[previous_end:start] = previous
+            weight = (1 - alpha) ** (start - previous_end + 1)
+            first = (weight * previous + alpha * values[start]) / (weight + alpha)
+        result[start:end] = ema_run(values[start:end], span, first)
+        previous, previous_end = result[end - 1], end
+    if previous is not None:
+        result[previous_end:] = previous
+    return result
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    # Simple-average RSI with min_periods=1, like calculate_rsi: the first bars average over what is there
+    delta = np.diff(close, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    counts = np.minimum(np.arange(1, len(close) + 1), period)
+    padding = np.zeros(period - 1)
+    avg_gain = rolling_sum(np.concatenate([padding, gain]), period)[period - 1:] / counts
+    avg_loss = rolling_sum(np.concatenate([padding, loss]), period)[period - 1:] / counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def stochastic(close: np.ndarray, low: np.ndarray, high: np.ndarray, period: int = STOCH_PERIOD,
+               smoothing: int = STOCH_SMOOTHING) -> Tuple[np.ndarray, np.ndarray]:
+    low_min = rolling_min(low, period)
+    high_max = rolling_max(high, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stoch_k = 100 * ((close - low_min) / (high_max - low_min))
+    return stoch_k, rolling_mean(stoch_k, smoothing)
+
+
+def macd(close: np.ndarray, short_period: int = MACD_SHORT, long_period: int = MACD_LONG,
+         signal_period: int = MACD_SIGNAL) -> Tuple[np.ndarray, np.ndarray]:
+    line = ema(close, short_period) - ema(close, long_period)
+    return line, ema(line, signal_period)
+
+
+def level_signal(values: np.ndarray, buy_below: float, sell_above: float) -> np.ndarray:
+    return np.select([values < buy_below, values > sell_above], ["BUY", "SELL"], "HOLD")
+
+
+def trend_signal(close: np.ndarray, average: np.ndarray) -> np.ndarray:
+    return np.select([close > average, close < average], ["BUY", "SELL"], "HOLD")
+
+
+def compute_indicators(close: np.ndarray, low: np.ndarray, high: np.ndarray,
+                       latest_only: bool = False) -> Dict[str, np.ndarray]:
+    # Indicator and signal columns under the names calculate_indicators uses.
+    # latest_only keeps only the last bar: the rolling indicators then only look at the bars their last window
+    # needs; the EMAs still run over the whole history, since every bar contributes to them.
+    close, low, high = (np.asarray(column, dtype=np.float64) for column in (close, low, high))
+    if latest_only:
+        rsi_values = rsi(close[-(RSI_PERIOD + 1):])[-1:]
+        tail = STOCH_PERIOD + STOCH_SMOOTHING - 1
+        stoch_k, stoch_d = (values[-1:] for values in stochastic(close[-tail:], low[-tail:], high[-tail:]))
+        sma_values = rolling_mean(close[-SMA_PERIOD:], SMA_PERIOD)[-1:]
+        macd_values = macd(close)[0][-1:]
+        ema_values = ema(close, EMA_PERIOD)[-1:]
+        close = close[-1:]
+    else:
+        rsi_values = rsi(close)
+        stoch_k, stoch_d = stochastic(close, low, high)
+        macd_values = macd(close)[0]
+        sma_values = rolling_mean(close, SMA_PERIOD)
+        ema_values = ema(close, EMA_PERIOD)
+
+    return {
+        "RSI": rsi_values,
+        "STOCH_K": stoch_k,
+        "STOCH_D": stoch_d,
+        "MACD": macd_values,
+        "SMA": sma_values,
+        "EMA": ema_values,
+        "RSI_SIGNAL": level_signal(rsi_values, 30, 70),
+        "STOCH_SIGNAL": level_signal(stoch_k, 20, 80),
+        # As before, MACD_SIGNAL holds the BUY/SELL side of the MACD line, not the signal line
+        "MACD_SIGNAL": np.where(macd_values > 0, "BUY", "SELL"),
+        "SMA_SIGNAL": trend_signal(close, sma_values),
+        "EMA_SIGNAL": trend_signal(close, ema_values)
+    }
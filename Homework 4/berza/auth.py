@@ -2,20 +2,7 @@ from flask import Blueprint, request, render_template, redirect, url_for, flash,
 from pydantic import EmailStr
 from passlib.context import CryptContext
 from itsdangerous import URLSafeTimedSerializer
-from pymongo import MongoClient
-
-class DatabaseManager:
-    _instance = None
-
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super().__new__(cls, *args, **kwargs)
-            cls._instance.client = MongoClient("mongodb://mongo:27017/")
-            cls._instance.db = cls._instance.client["user_db"]
-        return cls._instance
-    
-    def get_collection(self, collection_name):
-        return self.db[collection_name]
+from repository import MongoRepository
 
 class SecurityFactory:
     @staticmethod
@@ -47,8 +34,7 @@ class AuthUtils:
             return None
         
 auth_router = Blueprint('auth', __name__, template_folder='templates')
-db_manager = DatabaseManager()
-user_collection = db_manager.get_collection("users")
+user_collection = MongoRepository().collection("users", "user_db")
 auth_utils = AuthUtils("DAS-DAS-DAS")
 
 @auth_router.route('/register', methods=['GET', 'POST'])
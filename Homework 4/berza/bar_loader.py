@@ -0,0 +1,91 @@
+from typing import Iterable, List
+import numpy as np
+import pandas as pd
+from bson import decode_all
+from repository import MongoRepository
+import schema
+
+try:
+    import pyarrow as pa
+    from pymongoarrow.api import Schema, find_arrow_all
+except ImportError:
+    pa = None
+
+BAR_FIELDS = ["last_trade_price", "max_price", "min_price", "avg_price", "percent_change", "volume", "turnover",
+              "total_turnover"]
+
+
+# Strategy Pattern for turning bar documents into typed columns without a Python dict per bar on the hot path.
+# Both loaders return a DataFrame with a datetime64 "date" column (sorted) plus the requested float/int columns.
+class BarLoader:
+    def __init__(self, repository: MongoRepository = None):
+        self.repository = repository or MongoRepository()
+
+    def load(self, stock_code: str, start=None, end=None, fields: List[str] = None) -> pd.DataFrame:
+        fields = fields or BAR_FIELDS
+        query = {"company_name": stock_code, **schema.date_range_filter(start, end)}
+        projection = {"_id": 0, "date": 1, **{field: 1 for field in fields}}
+        return self.load_query(query, projection, fields)
+
+    def load_query(self, query: dict, projection: dict, fields: List[str]) -> pd.DataFrame:
+        raise NotImplementedError("Subclasses must implement the `load_query` method.")
+
+
+class ArrowBarLoader(BarLoader):
+    # pymongoarrow decodes the BSON batches in C straight into Arrow arrays
+    def load_query(self, query: dict, projection: dict, fields: List[str]) -> pd.DataFrame:
+        arrow_schema = Schema({"date": pa.timestamp("ms"),
+                               **{field: pa.int64() if field == "volume" else pa.float64() for field in fields}})
+        table = find_arrow_all(self.repository.bars_collection(), query, schema=arrow_schema,
+                               projection=projection, sort=[("date", 1)])
+        return table.to_pandas()
+
+
+class RawBsonBarLoader(BarLoader):
+    # Without pymongoarrow: raw BSON batches, decoded in C, projected server side and gathered column by column
+    def load_query(self, query: dict, projection: dict, fields: List[str]) -> pd.DataFrame:
+        cursor = self.repository.bars_collection().find_raw_batches(query, projection, sort=[("date", 1)])
+        return columns_from_documents((document for batch in cursor for document in decode_all(batch)), fields)
+
+
+def columns_from_documents(documents: Iterable[dict], fields: List[str]) -> pd.DataFrame:
+    documents = list(documents)
+    columns = {"date": pd.to_datetime([document.get("date") for document in documents])}
+    for field in fields:
+        values = [document.get(field) for document in documents]
+        try:
+            column = np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            # Legacy v1 documents still hold locale strings; they are converted once here, not by every reader
+            column = np.array([schema.to_number(value) for value in values], dtype=np.float64)
+        if field == "volume" and not np.isnan(column).any():
+            column = column.astype(np.int64)
+        columns[field] = column
+    return pd.DataFrame(columns)
+
+
+_typed_collections = set()
+
+
+def collection_is_typed(collection) -> bool:
+    # Arrow needs fixed column types, so it is only used once no legacy v1 document is left.
+    # Writers only produce typed bars, so a positive answer is cached for the life of the process.
+    if collection.full_name not in _typed_collections:
+        if collection.find_one({"schema_version": {"$ne": schema.SCHEMA_VERSION}}, {"_id": 1}) is not None:
+            return False
+        _typed_collections.add(collection.full_name)
+    return True
+
+
+# Factory Pattern for Bar Loaders
+class BarLoaderFactory:
+    @staticmethod
+    def create_loader(repository: MongoRepository = None) -> BarLoader:
+        repository = repository or MongoRepository()
+        if pa is not None and collection_is_typed(repository.bars_collection()):
+            return ArrowBarLoader(repository)
+        return RawBsonBarLoader(repository)
+
+
+def load_bars(stock_code: str, start=None, end=None, fields: List[str] = None) -> pd.DataFrame:
+    return BarLoaderFactory.create_loader().load(stock_code, start, end, fields)
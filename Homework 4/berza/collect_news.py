@@ -1,6 +1,8 @@
 import os, csv, requests, html, re, pdfplumber
 from io import BytesIO
 from datetime import datetime
+from http_cache import ResponseCache
+import settings
 
 class CSVManager:
     _instance = None
@@ -48,8 +50,9 @@ class ContentExtractorFactory:
 
 class PdfContentExtractor:
     def extract_content(self, attachment):
-        attachment_url = f"https://api.seinet.com.mk/public/documents/attachment/{attachment.get('attachmentId')}"
-        response = requests.get(attachment_url)
+        attachment_url = f"{settings.SEINET_API_URL}/documents/attachment/{attachment.get('attachmentId')}"
+        # Published attachments never change once issued
+        response = ResponseCache().request(requests, "GET", attachment_url, immutable=True)
         if response.status_code == 200:
             pdf_file = BytesIO(response.content)
             with pdfplumber.open(pdf_file) as pdf:
@@ -75,7 +78,7 @@ class NewsFetcher:
         }
         headers = {"Content-Type": "application/json"}
 
-        response = requests.post(self.api_url, json=payload, headers=headers)
+        response = ResponseCache().request(requests, "POST", self.api_url, json_body=payload, headers=headers)
         if response.status_code == 200:
             return response.json().get('data', [])
         else:
@@ -99,7 +102,7 @@ def extract_and_process_content(news_data):
         print(f"Error processing document {news_data.get('documentId', 'unknown')}: {e}")
 
 def retrieve_all_news():
-    news_fetcher = NewsFetcher("https://api.seinet.com.mk/public/documents")
+    news_fetcher = NewsFetcher(f"{settings.SEINET_API_URL}/documents")
     page_number = 1
     all_news = []
 
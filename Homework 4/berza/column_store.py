@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from bar_loader import BAR_FIELDS, BarLoader, BarLoaderFactory
+from repository import MongoRepository
+import schema
+import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Local columnar copy of the daily bars: one directory per symbol with one flat file per column.
+#   <COLUMN_STORE_DIR>/<symbol>/meta.json           {"generation", "rows", "last_date", "synced_at", "version"}
+#   <COLUMN_STORE_DIR>/<symbol>/<generation>.<column>  little-endian values, date order
+# Newer bars are appended to the current generation; older or corrected bars rewrite the symbol into the
+# next generation. meta.json is replaced last, so a reader only ever maps rows that are completely written.
+COLUMN_DTYPES = {"date": np.dtype("<M8[s]"),
+                 **{field: np.dtype("<i8") if field == "volume" else np.dtype("<f8") for field in BAR_FIELDS}}
+SYMBOL_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+# Zero-copy NumPy views of one symbol's columns
+class SymbolColumns:
+    def __init__(self, stock_code: str, dates: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.stock_code = stock_code
+        self.dates = dates
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def between(self, start=None, end=None) -> "SymbolColumns":
+        # Dates are sorted, so a range is two binary searches and a slice of every map
+        first = np.searchsorted(self.dates, np.datetime64(schema.to_date(start), "s")) if start is not None else 0
+        last = (np.searchsorted(self.dates, np.datetime64(schema.to_date(end), "s"), side="right")
+                if end is not None else len(self.dates))
+        return SymbolColumns(self.stock_code, self.dates[first:last],
+                             {field: column[first:last] for field, column in self.columns.items()})
+
+    def to_frame(self, fields: List[str] = None) -> pd.DataFrame:
+        # Same shape as the Mongo loaders; the columns stay backed by the read-only maps
+        fields = fields or BAR_FIELDS
+        return pd.DataFrame({"date": self.dates, **{field: self.columns[field] for field in fields}}, copy=False)
+
+
+# Singleton Pattern for the on-disk column store
+class ColumnStore:
+    _instance = None
+    # Writers of one symbol are serialized within the process; flock does the same across processes
+    _locks = defaultdict(threading.Lock)
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance.root = settings.COLUMN_STORE_DIR
+            cls._instance._maps = {}
+        return cls._instance
+
+    @staticmethod
+    def accepts(stock_code: str) -> bool:
+        # Symbols come from URLs, so only plain names become directory names
+        return bool(SYMBOL_PATTERN.fullmatch(stock_code or ""))
+
+    def _path(self, stock_code: str, name: str) -> str:
+        return os.path.join(self.root, stock_code, name)
+
+    def _column_path(self, stock_code: str, generation: int, column: str) -> str:
+        return self._path(stock_code, f"{generation}.{column}")
+
+    def read_meta(self, stock_code: str) -> Optional[dict]:
+        try:
+            with open(self._path(stock_code, "meta.json"), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, stock_code: str, meta: dict):
+        path = self._path(stock_code, "meta.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked(self, stock_code: str):
+        os.makedirs(self._path(stock_code, ""), exist_ok=True)
+        with self._locks[stock_code], open(self._path(stock_code, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def open(self, stock_code: str) -> Optional[SymbolColumns]:
+        if not self.accepts(stock_code):
+            return None
+        for _ in range(2):
+            meta = self.read_meta(stock_code)
+            if meta is None or not meta["rows"]:
+                return None
+            try:
+                return self._map(stock_code, meta)
+            except FileNotFoundError:
+                # A rewrite removed the generation between reading meta.json and mapping; read it again
+                continue
+        return None
+
+    def _map(self, stock_code: str, meta: dict) -> SymbolColumns:
+        generation, rows = meta["generation"], meta["rows"]
+        mapped = self._maps.get(stock_code)
+        # Maps of the current generation are reused while they cover the committed rows
+        if mapped is None or mapped[0] != generation or len(mapped[1]) < rows:
+            arrays = {column: np.memmap(self._column_path(stock_code, generation, column), dtype=dtype, mode="r")
+                      for column, dtype in COLUMN_DTYPES.items()}
+            mapped = (generation, arrays.pop("date"), arrays)
+            self._maps[stock_code] = mapped
+        _, dates, columns = mapped
+        return SymbolColumns(stock_code, dates[:rows], {field: column[:rows] for field, column in columns.items()})
+
+    def write(self, stock_code: str, dates: np.ndarray, columns: Dict[str, np.ndarray], version: int = None) -> int:
+        if not self.accepts(stock_code) or not len(dates):
+            return 0
+        dates = np.asarray(dates).astype(COLUMN_DTYPES["date"])
+        order = np.argsort(dates, kind="stable")
+        new = {"date": dates[order]}
+        for field in BAR_FIELDS:
+            values = np.asarray(columns[field], dtype=np.float64)[order] if field in columns \
+                else np.full(len(dates), np.nan)
+            if field == "volume":
+                values = np.nan_to_num(values)
+            new[field] = values.astype(COLUMN_DTYPES[field])
+
+        with self._locked(stock_code):
+            meta = self.read_meta(stock_code)
+            # Concurrent window flushes may finish out of order, so the stored data version only moves forward
+            stored_version = max(meta.get("version", 0) if meta else 0, version or 0)
+            if meta and meta["rows"] and new["date"][0] >= np.datetime64(meta["last_date"], "s") and \
+                    len(np.unique(new["date"])) == len(new["date"]):
+                meta = self._append(stock_code, meta, new)
+            else:
+                meta = self._rewrite(stock_code, meta, new)
+            self._write_meta(stock_code, {**meta, "synced_at": time.time(), "version": stored_version})
+        return len(dates)
+
+    def _append(self, stock_code: str, meta: dict, new: Dict[str, np.ndarray]) -> dict:
+        # A batch starting at the stored last day (the re-fetched last bar of every refresh) overwrites that row
+        rows = meta["rows"] - int(new["date"][0] == np.datetime64(meta["last_date"], "s"))
+        for column, dtype in COLUMN_DTYPES.items():
+            with open(self._column_path(stock_code, meta["generation"], column), "r+b") as file:
+                # Writes over whatever an interrupted append left behind the committed rows, then cuts the rest.
+                # The file never gets shorter than the committed rows, which open maps may still read.
+                file.seek(rows * dtype.itemsize)
+                file.write(new[column].tobytes())
+                file.truncate()
+        return {**meta, "rows": rows + len(new["date"]),
+                "last_date": str(new["date"][-1].astype("datetime64[D]"))}
+
+    def _rewrite(self, stock_code: str, meta: Optional[dict], new: Dict[str, np.ndarray]) -> dict:
+        current = self.open(stock_code) if meta else None
+        merged = new
+        if current is not None:
+            merged = {column: np.concatenate([current.dates if column == "date" else current[column], new[column]])
+                      for column in COLUMN_DTYPES}
+            order = np.argsort(merged["date"], kind="stable")
+            merged = {column: values[order] for column, values in merged.items()}
+        # On equal dates the new bar comes last after the stable sort and is the one kept
+        keep = np.append(merged["date"][1:] != merged["date"][:-1], True)
+        merged = {column: values[keep] for column, values in merged.items()}
+
+        generation = meta["generation"] + 1 if meta else 0
+        for column in COLUMN_DTYPES:
+            merged[column].tofile(self._column_path(stock_code, generation, column))
+        if meta:
+            # Open maps keep the unlinked files alive until their readers drop them
+            for column in COLUMN_DTYPES:
+                try:
+                    os.remove(self._column_path(stock_code, meta["generation"], column))
+                except FileNotFoundError:
+                    pass
+        return {"generation": generation, "rows": int(len(merged["date"])),
+                "last_date": str(merged["date"][-1].astype("datetime64[D]"))}
+
+    def on_bars_written(self, event):
+        # Only events of this process carry the bars; for the others the data version makes readers reload
+        if event.batch is not None:
+            self.write(event.stock_code, event.batch.dates, event.batch.columns, event.version)
+
+    def mark_synced(self, stock_code: str, version: int = None):
+        # Mongo had nothing newer; the next refresh waits for another COLUMN_STORE_MAX_AGE
+        with self._locked(stock_code):
+            meta = self.read_meta(stock_code)
+            if meta:
+                self._write_meta(stock_code, {**meta, "synced_at": time.time(),
+                                              "version": max(meta.get("version", 0), version or 0)})
+
+    def write_frame(self, stock_code: str, df: pd.DataFrame, version: int = None) -> int:
+        return self.write(stock_code, df['date'].to_numpy(), {field: df[field].to_numpy() for field in BAR_FIELDS
+                                                             if field in df}, version)
+
+    def remove(self, stock_code: str):
+        with self._locked(stock_code):
+            meta = self.read_meta(stock_code)
+            if meta:
+                os.remove(self._path(stock_code, "meta.json"))
+                for column in COLUMN_DTYPES:
+                    try:
+                        os.remove(self._column_path(stock_code, meta["generation"], column))
+                    except FileNotFoundError:
+                        pass
+        self._maps.pop(stock_code, None)
+
+
+# Read path for the web app and the predictors: bars come from the column store, and Mongo is only asked for
+# symbols the store has not seen yet and, after COLUMN_STORE_MAX_AGE seconds, for bars newer than the stored ones.
+# Given the symbol's data version (frame_cache.DataVersions), a store that is behind it is reloaded instead.
+class ColumnStoreLoader(BarLoader):
+    def __init__(self, repository: MongoRepository = None):
+        super().__init__(repository)
+        self.store = ColumnStore()
+        self.fallback = BarLoaderFactory.create_loader(self.repository)
+
+    def columns(self, stock_code: str, start=None, end=None, version: int = None) -> Optional[SymbolColumns]:
+        if not settings.COLUMN_STORE_ENABLED or not self.store.accepts(stock_code):
+            return None
+        meta = self.store.read_meta(stock_code)
+        if meta is None or (version is not None and meta.get("version", 0) < version):
+            # Missing, or changed by an ingest that did not write this store (another host): the bars may have
+            # changed anywhere in the history, so all of it is read again
+            history = self.fallback.load(stock_code, fields=BAR_FIELDS)
+            if history.empty:
+                return None
+            self.store.write_frame(stock_code, history, version)
+        elif time.time() - meta.get("synced_at", 0) > settings.COLUMN_STORE_MAX_AGE:
+            # The last stored day is read again as well, in case it was still being traded
+            if not self.store.write_frame(stock_code, self.fallback.load(stock_code, start=meta["last_date"],
+                                                                         fields=BAR_FIELDS)):
+                self.store.mark_synced(stock_code)
+        columns = self.store.open(stock_code)
+        return columns.between(start, end) if columns is not None else None
+
+    def load(self, stock_code: str, start=None, end=None, fields: List[str] = None,
+             version: int = None) -> pd.DataFrame:
+        columns = self.columns(stock_code, start, end, version)
+        if columns is None:
+            return self.fallback.load(stock_code, start, end, fields)
+        return columns.to_frame(fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the local column store from MongoDB.")
+    parser.add_argument("stock_codes", nargs="*", help="Symbols to rebuild (default: every symbol with bars)")
+    args = parser.parse_args()
+
+    repository = MongoRepository()
+    loader = BarLoaderFactory.create_loader(repository)
+    store = ColumnStore()
+    stock_codes = args.stock_codes or sorted(repository.bars_collection().distinct("company_name"))
+    for stock_code in stock_codes:
+        store.remove(stock_code)
+        history = loader.load(stock_code, fields=BAR_FIELDS)
+        print(f"{stock_code}: {store.write_frame(stock_code, history)} bars in {settings.COLUMN_STORE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
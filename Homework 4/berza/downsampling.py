@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+
+def bucket_edges(length: int, points: int) -> np.ndarray:
+    # The first and last bar are kept as they are; the bars in between are split into points - 2 buckets
+    return np.linspace(1, length - 1, points - 1).astype(np.int64)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: from every bucket keep the bar that spans the largest triangle with
+    # the previously kept bar and the average of the next bucket, so peaks and troughs survive.
+    # Returns the indices of the kept bars.
+    length = len(x)
+    if points >= length or points < 3:
+        return np.arange(length)
+
+    edges = bucket_edges(length, points)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = length - 1, length
+        average_x, average_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - average_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (average_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_bars(df: pd.DataFrame, points: int) -> pd.DataFrame:
+    # Closing prices go through LTTB; min/max keep the bucket's extremes and volume the bucket's total,
+    # so the chart keeps its envelope and traded volume at any zoom level.
+    if len(df) <= points or points < 3:
+        return df
+
+    x = df['date'].to_numpy().astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    y = df['last_trade_price'].ffill().bfill().to_numpy(dtype=np.float64)
+    selected = lttb(x, y, points)
+
+    # Bucket boundaries match the ones LTTB used: [0], the middle buckets, [length - 1]
+    edges = np.concatenate([[0], bucket_edges(len(df), points), [len(df)]])
+    result = df.iloc[selected].reset_index(drop=True)
+    if 'min_price' in df:
+        result['min_price'] = np.fmin.reduceat(df['min_price'].to_numpy(dtype=np.float64), edges[:-1])
+    if 'max_price' in df:
+        result['max_price'] = np.fmax.reduceat(df['max_price'].to_numpy(dtype=np.float64), edges[:-1])
+    if 'volume' in df:
+        result['volume'] = np.add.reduceat(df['volume'].fillna(0).to_numpy(), edges[:-1])
+    return result
@@ -0,0 +1,162 @@
+import os
+import socket
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+from uuid import uuid4
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from frame_cache import DataVersions
+from repository import MongoRepository
+import settings
+
+
+# A write of new bars for one symbol, published by the ingest path after the bars are stored.
+# batch (the RowBatch itself) only travels to in-process subscribers; other processes get the summary fields.
+# sequence numbers the events of one source (publishing process) in the order they were appended.
+class BarsWritten:
+    def __init__(self, stock_code: str, first_date: str, last_date: str, rows: int, version: int,
+                 batch=None, source: str = None, sequence: int = 0):
+        self.stock_code = stock_code
+        self.first_date = first_date
+        self.last_date = last_date
+        self.rows = rows
+        self.version = version
+        self.batch = batch
+        self.source = source
+        self.sequence = sequence
+
+    def to_document(self) -> dict:
+        return {"stock_code": self.stock_code, "first_date": self.first_date, "last_date": self.last_date,
+                "rows": self.rows, "version": self.version, "source": self.source, "sequence": self.sequence,
+                "published_at": datetime.now()}
+
+    @classmethod
+    def from_document(cls, document: dict) -> "BarsWritten":
+        return cls(document["stock_code"], document["first_date"], document["last_date"], document["rows"],
+                   document["version"], source=document.get("source"), sequence=document.get("sequence", 0))
+
+
+# Observer Pattern for ingest events, in-process and across processes.
+# publish() bumps the symbol's data version, runs the local subscribers in order and appends the event to a capped
+# collection that EventListener threads in other processes tail.
+class EventBus:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        # Like the repository, a forked process starts with its own subscribers
+        if cls._instance is None or cls._instance.pid != os.getpid():
+            instance = super().__new__(cls)
+            instance.pid = os.getpid()
+            # The random part keeps a restarted process that got the same pid from looking like the old one
+            instance.source = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+            instance.sequence = 0
+            instance._append_lock = threading.Lock()
+            instance.repository = MongoRepository()
+            instance.versions = DataVersions(instance.repository)
+            instance._handlers = OrderedDict()
+            instance._lock = threading.Lock()
+            instance._capped = False
+            cls._instance = instance
+        return cls._instance
+
+    def subscribe(self, name: str, handler: Callable[[BarsWritten], None]):
+        # Keyed by name, so components created once per run do not subscribe twice
+        with self._lock:
+            self._handlers[name] = handler
+
+    def unsubscribe(self, name: str):
+        with self._lock:
+            self._handlers.pop(name, None)
+
+    def collection(self):
+        collection = self.repository.collection(settings.EVENTS_COLLECTION)
+        if not self._capped:
+            try:
+                self.repository.database().create_collection(settings.EVENTS_COLLECTION, capped=True,
+                                                             size=settings.EVENTS_CAPPED_BYTES)
+            except CollectionInvalid:
+                pass
+            self._capped = True
+        return collection
+
+    def publish(self, stock_code: str, first_date: str, last_date: str, rows: int, batch=None) -> BarsWritten:
+        version = self.versions.bump(stock_code, last_date, rows)
+        event = BarsWritten(stock_code, first_date, last_date, rows, version, batch, self.source)
+        self.dispatch(event)
+        try:
+            # Numbered and appended under one lock, so this source's events sit in the collection in order
+            with self._append_lock:
+                self.sequence += 1
+                event.sequence = self.sequence
+                self.collection().insert_one(event.to_document())
+        except PyMongoError as e:
+            # Other processes still see the new data version; they only miss the early notice
+            print(f"Could not publish the ingest event for {stock_code}: {e}")
+        return event
+
+    def dispatch(self, event: BarsWritten):
+        with self._lock:
+            handlers = list(self._handlers.items())
+        for name, handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                # The bars are already stored; a failed subscriber is repaired by its own rebuild
+                print(f"Ingest event handler {name} failed for {event.stock_code}: {e}")
+
+
+# Tails the capped event collection and hands events published by other processes to the local subscribers.
+# ObjectIds from different hosts and processes are not ordered, so the position is not an _id: every (re)start
+# tails the collection in natural order from the beginning and skips what was already seen, by the last
+# sequence number handled per source.
+class EventListener(threading.Thread):
+    def __init__(self, bus: EventBus = None, retry_seconds: float = 5.0):
+        super().__init__(name="ingest-event-listener", daemon=True)
+        self.bus = bus or EventBus()
+        self.retry_seconds = retry_seconds
+        self.seen = {}
+        self.started = False
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self._tail()
+            except Exception as e:
+                print(f"Ingest event listener: {e}")
+                self.stopped.wait(self.retry_seconds)
+
+    def _tail(self):
+        collection = self.bus.collection()
+        if not self.started:
+            # Only events published from now on; what happened before is already reflected in the data versions
+            for document in collection.find({}, {"source": 1, "sequence": 1}):
+                self._is_new(document)
+            self.started = True
+        cursor = collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+        while cursor.alive and not self.stopped.is_set():
+            for document in cursor:
+                if self._is_new(document) and document.get("source") != self.bus.source:
+                    self.bus.dispatch(BarsWritten.from_document(document))
+        # A tailable cursor on an empty capped collection closes right away
+        self.stopped.wait(1.0)
+
+    def _is_new(self, document: dict) -> bool:
+        source, sequence = document.get("source"), document.get("sequence", 0)
+        if sequence <= self.seen.get(source, 0):
+            return False
+        self.seen[source] = sequence
+        return True
+
+
+def start_listener(bus: EventBus = None) -> Optional[EventListener]:
+    if not settings.EVENTS_LISTEN:
+        return None
+    listener = EventListener(bus)
+    listener.start()
+    return listener
@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from pymongo import ReturnDocument
+from bar_loader import BAR_FIELDS, BarLoader
+from column_store import ColumnStoreLoader
+from repository import MongoRepository
+import schema
+import settings
+
+
+# Repository Pattern for the per-symbol data versions.
+# The ingest path bumps a symbol's version after every write, so (symbol, version) names one exact state of its bars.
+class DataVersions:
+    def __init__(self, repository: MongoRepository = None):
+        self.repository = repository or MongoRepository()
+
+    def collection(self):
+        return self.repository.collection(settings.DATA_VERSIONS_COLLECTION)
+
+    def bump(self, stock_code: str, last_date: str = None, rows: int = 0) -> int:
+        document = self.collection().find_one_and_update(
+            {"_id": stock_code},
+            {"$inc": {"version": 1}, "$max": {"last_date": last_date or ""},
+             "$set": {"rows": rows, "updated_at": datetime.now()}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return document["version"]
+
+    def bump_all(self, stock_codes):
+        # Migrations, deduplication and rebuilds change bars without an ingest event; the bump still makes
+        # every reader of these symbols load them again
+        for stock_code in sorted(set(stock_codes)):
+            self.bump(stock_code)
+
+    def get(self, stock_code: str) -> int:
+        # Symbols no ingest has written yet are at version 0
+        document = self.collection().find_one({"_id": stock_code}, {"version": 1})
+        return document["version"] if document else 0
+
+
+# Singleton Pattern for the in-process LRU cache of full per-symbol bar frames.
+# An entry is only served for the data version it was loaded at; bounded by FRAME_CACHE_MAX_BYTES.
+class FrameCache:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance.max_bytes = settings.FRAME_CACHE_MAX_BYTES
+            cls._instance._entries = OrderedDict()
+            cls._instance._lock = threading.Lock()
+            cls._instance.size = 0
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+            cls._instance.evictions = 0
+        return cls._instance
+
+    def get(self, key: Tuple[str, str], version: int) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[str, str], version: int, frame: pd.DataFrame):
+        size = int(frame.memory_usage(index=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self._entries[key] = (version, frame, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def discard(self, key: Tuple[str, str]):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[2]
+
+    def on_bars_written(self, event):
+        # The version check alone keeps hits exact; dropping the stale frame right away frees its memory
+        self.discard((settings.STOCK_DATA_COLLECTION, event.stock_code))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+# Read path shared by company_info, analyze_stock and the LSTM: one version lookup per call,
+# and the symbol's history is only loaded again after an ingest has changed it.
+class CachedBarLoader(BarLoader):
+    def __init__(self, repository: MongoRepository = None):
+        super().__init__(repository)
+        self.source = ColumnStoreLoader(self.repository)
+        self.versions = DataVersions(self.repository)
+        self.cache = FrameCache()
+
+    def history(self, stock_code: str) -> pd.DataFrame:
+        key = (settings.STOCK_DATA_COLLECTION, stock_code)
+        version = self.versions.get(stock_code)
+        frame = self.cache.get(key, version)
+        if frame is None:
+            frame = self.source.load(stock_code, fields=BAR_FIELDS, version=version)
+            self.cache.put(key, version, frame)
+        return frame
+
+    def load(self, stock_code: str, start=None, end=None, fields: List[str] = None) -> pd.DataFrame:
+        frame = self.history(stock_code)
+        dates = frame['date'].to_numpy()
+        first = np.searchsorted(dates, np.datetime64(schema.to_date(start))) if start is not None else 0
+        last = np.searchsorted(dates, np.datetime64(schema.to_date(end)), side="right") if end is not None \
+            else len(dates)
+        # A new frame over the cached one: callers may set an index or add columns without touching the entry
+        return frame.iloc[first:last][["date"] + (fields or BAR_FIELDS)].reset_index(drop=True)
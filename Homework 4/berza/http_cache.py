@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+import requests
+from requests.structures import CaseInsensitiveDict
+import settings
+
+
+class CacheMissError(Exception):
+    pass
+
+
+class CacheEntry:
+    def __init__(self, cache, key: str, meta: dict):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+
+    @property
+    def immutable(self) -> bool:
+        return self.meta.get("immutable", False)
+
+    @property
+    def content(self) -> bytes:
+        return self.cache.read_object(self.meta["body_sha"])
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.meta.get("encoding") or "utf-8", errors="replace")
+
+
+# Singleton Pattern for the on-disk response cache
+# index/<request key>.json holds the validators and points at objects/<sha256 of body>, so identical bodies are stored once.
+class ResponseCache:
+    _instance = None
+    # A process prunes at most this often; the stamp file keeps parallel processes from all walking the cache
+    PRUNE_INTERVAL_SECONDS = 6 * 3600
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance.cache_dir = settings.HTTP_CACHE_DIR
+            cls._instance.mode = settings.HTTP_CACHE_MODE
+            cls._instance.max_age = timedelta(days=settings.HTTP_CACHE_MAX_AGE_DAYS)
+            cls._instance.max_bytes = settings.HTTP_CACHE_MAX_BYTES
+            cls._instance._pruned = False
+        return cls._instance
+
+    @staticmethod
+    def make_key(method: str, url: str, params: dict = None, body=None) -> str:
+        request = {"method": method.upper(), "url": url, "params": sorted((params or {}).items()), "body": body}
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _path(self, kind: str, name: str, suffix: str = "") -> str:
+        return os.path.join(self.cache_dir, kind, name[:2], name + suffix)
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def read_object(self, body_sha: str) -> bytes:
+        with open(self._path("objects", body_sha), "rb") as file:
+            return file.read()
+
+    def lookup(self, method: str, url: str, params: dict = None, body=None) -> Optional[CacheEntry]:
+        if self.mode == "off":
+            return None
+        key = self.make_key(method, url, params, body)
+        try:
+            with open(self._path("index", key, ".json"), "r", encoding="utf-8") as file:
+                meta = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            meta = None
+        if meta is None or not os.path.exists(self._path("objects", meta["body_sha"])):
+            if self.mode == "replay":
+                raise CacheMissError(f"No cached response for {method.upper()} {url} {params or ''}")
+            return None
+        return CacheEntry(self, key, meta)
+
+    def serves_offline(self, entry: Optional[CacheEntry]) -> bool:
+        return entry is not None and (entry.immutable or self.mode == "replay")
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> dict:
+        headers = {}
+        if entry is not None:
+            if entry.meta.get("etag"):
+                headers["If-None-Match"] = entry.meta["etag"]
+            if entry.meta.get("last_modified"):
+                headers["If-Modified-Since"] = entry.meta["last_modified"]
+        return headers
+
+    def persists(self, method: str, headers, immutable: bool) -> bool:
+        # Online, only what can be used again is kept: immutable pages, and GETs with a validator to revalidate.
+        # POSTs and volatile pages (the homepage scrape) are only written when recording for a replay.
+        if self.mode == "record":
+            return True
+        if self.mode != "online" or method.upper() != "GET":
+            return False
+        return immutable or bool(headers.get("ETag") or headers.get("Last-Modified"))
+
+    def save(self, method: str, url: str, params: dict, body, content: bytes, headers, immutable: bool = False,
+             encoding: str = None) -> Optional[CacheEntry]:
+        if not self.persists(method, headers, immutable):
+            return None
+        self.prune_if_due()
+        body_sha = hashlib.sha256(content).hexdigest()
+        if not os.path.exists(self._path("objects", body_sha)):
+            self._write_atomic(self._path("objects", body_sha), content)
+        key = self.make_key(method, url, params, body)
+        meta = {
+            "url": url,
+            "params": params,
+            "body_sha": body_sha,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "encoding": encoding,
+            "immutable": immutable,
+            "fetched_at": datetime.now().isoformat()
+        }
+        self._write_atomic(self._path("index", key, ".json"), json.dumps(meta).encode("utf-8"))
+        return CacheEntry(self, key, meta)
+
+    def prune_if_due(self):
+        if self._pruned or self.mode != "online":
+            return
+        self._pruned = True
+        stamp = os.path.join(self.cache_dir, "last_prune")
+        try:
+            if time.time() - os.path.getmtime(stamp) < self.PRUNE_INTERVAL_SECONDS:
+                return
+        except FileNotFoundError:
+            pass
+        self._write_atomic(stamp, b"")
+        removed = self.prune()
+        if removed:
+            print(f"Pruned {removed} expired HTTP cache entries.")
+
+    def _walk(self, kind: str):
+        root = os.path.join(self.cache_dir, kind)
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                if not file_name.endswith(".tmp"):
+                    yield os.path.join(directory, file_name)
+
+    def prune(self) -> int:
+        # Drops entries that are not immutable once they are older than max_age, then the oldest of them while the
+        # objects exceed max_bytes, then every object no entry points at. Immutable entries are never dropped.
+        started = time.time()
+        cutoff = (datetime.now() - self.max_age).isoformat()
+        references, mutable, removed = Counter(), [], 0
+        for path in self._walk("index"):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    meta = json.load(file)
+            except (OSError, json.JSONDecodeError):
+                meta = None
+            if meta is None or (not meta.get("immutable") and meta.get("fetched_at", "") < cutoff):
+                self._remove(path)
+                removed += 1
+                continue
+            references[meta["body_sha"]] += 1
+            if not meta.get("immutable"):
+                mutable.append((meta.get("fetched_at", ""), path, meta["body_sha"]))
+
+        sizes = {}
+        for path in self._walk("objects"):
+            try:
+                sizes[os.path.basename(path)] = os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        total = sum(size for body_sha, size in sizes.items() if references[body_sha])
+        for _, path, body_sha in sorted(mutable):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            removed += 1
+            references[body_sha] -= 1
+            if not references[body_sha]:
+                total -= sizes.get(body_sha, 0)
+
+        for body_sha in sizes:
+            path = self._path("objects", body_sha)
+            # Objects written after the walk started may belong to entries it did not see
+            if not references[body_sha] and os.path.getmtime(path) < started:
+                self._remove(path)
+        return removed
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def request(self, session, method: str, url: str, params: dict = None, json_body=None, headers: dict = None,
+                immutable: bool = False) -> requests.Response:
+        # Drop-in for session.request(...) in the synchronous scrapers; `session` may be the requests module itself
+        entry = self.lookup(method, url, params, json_body)
+        if self.serves_offline(entry):
+            return self._to_response(url, entry)
+
+        request_headers = dict(headers or {})
+        request_headers.update(self.conditional_headers(entry))
+        response = session.request(method, url, params=params, json=json_body, headers=request_headers)
+        if response.status_code == 304 and entry is not None:
+            return self._to_response(url, entry)
+        if response.status_code == 200:
+            self.save(method, url, params, json_body, response.content, response.headers, immutable, response.encoding)
+        return response
+
+    @staticmethod
+    def _to_response(url: str, entry: CacheEntry) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = entry.content
+        response.encoding = entry.meta.get("encoding") or "utf-8"
+        response.headers = CaseInsensitiveDict({"Content-Type": entry.meta.get("content_type") or "", "X-Cache": "HIT"})
+        return response
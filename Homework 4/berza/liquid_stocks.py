@@ -1,5 +1,7 @@
 import requests
 from bs4 import BeautifulSoup
+from http_cache import ResponseCache
+import settings
 
 class RequestManager:
     _instance = None
@@ -11,7 +13,7 @@ class RequestManager:
         return cls._instance
 
     def get(self, url):
-        return self.session.get(url)
+        return ResponseCache().request(self.session, "GET", url)
 
 class DataExtractorFactory:
     @staticmethod
@@ -51,5 +53,5 @@ class TableDataExtractor:
             return {"error": "Failed to parse table data."}
 
 def most_liquid_stocks():
-    url = "https://www.mse.mk/mk"
+    url = f"{settings.MSE_BASE_URL}/mk"
     return DataExtractorFactory.get_data(url)
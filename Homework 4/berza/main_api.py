@@ -1,16 +1,20 @@
 import pandas as pd
-import numpy as np
 import base64
 import plotly.graph_objs as go
 from flask import Flask, render_template, jsonify, request, flash
 from Filters.Filter1 import fetch_valid
 from auth import auth_router
 from Predictors.LSTM import LSTMFactory
-from pymongo import MongoClient
 from Predictors.technical_analysis_api import analyze_stock
 from collect_news import update_news
 from liquid_stocks import most_liquid_stocks
 from fundamental.fundamental_analysis import get_fundamental_analysis
+from downsampling import downsample_bars
+from rollups import load_resolution
+from repository import MongoRepository
+from frame_cache import FrameCache
+from events import EventBus, start_listener
+import schema
 
 # Flask application setup
 app = Flask(__name__, static_folder="static")
@@ -18,19 +22,17 @@ app.config['SECRET_KEY'] = 'DAS-DAS-DAS'
 app.config['STATIC_FOLDER'] = 'static'
 app.config['TEMPLATES_FOLDER'] = 'templates'
 
-# MongoDB Client Singleton
-class MongoDBClient:
-    _instance = None
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance.client = MongoClient("mongodb://mongo:27017/")
-            cls._instance.db = cls._instance.client["stocks_db"]
-        return cls._instance
-
-mongo_client = MongoDBClient()
-db = mongo_client.db
-collection = db["stock_data"]
+# Chart ranges offered on the company page; the data for the range is filtered in Mongo, not in the browser
+CHART_RANGES = {
+    "1w": ("Last Week", 7),
+    "1m": ("Last Month", 30),
+    "1y": ("Last Year", 365),
+    "5y": ("Last 5 Years", 1825),
+    "all": ("All Data", None)
+}
+DEFAULT_CHART_RANGE = "1y"
+DEFAULT_CHART_POINTS = 500
+MAX_CHART_POINTS = 5000
 
 # Register authentication routes
 app.register_blueprint(auth_router, url_prefix="/auth")
@@ -65,34 +67,7 @@ class GraphFactory:
                 yaxis2=dict(title='volume', overlaying='y', side='right'),
                 template='plotly_dark',
                 height=600,
-                margin=dict(t=60, b=40, l=40, r=40),
-                updatemenus=[
-                    {
-                        'buttons': [
-                            {'label': 'Last Week',
-                            'method': 'relayout',
-                            'args': [{'xaxis.range': [df['date'].max() - pd.Timedelta(days=7), df['date'].max()]}]},
-                            {'label': 'Last Month',
-                            'method': 'relayout',
-                            'args': [{'xaxis.range': [df['date'].max() - pd.Timedelta(days=30), df['date'].max()]}]},
-                            {'label': 'Last Year',
-                            'method': 'relayout',
-                            'args': [{'xaxis.range': [df['date'].max() - pd.Timedelta(days=365), df['date'].max()]}]},
-                            {'label': 'Last 5 Years',
-                            'method': 'relayout',
-                            'args': [{'xaxis.range': [df['date'].max() - pd.Timedelta(days=1825), df['date'].max()]}]},
-                            {'label': 'All Data',
-                            'method': 'relayout',
-                            'args': [{'xaxis.range': [df['date'].min(), df['date'].max()]}]},
-                        ],
-                        'direction': 'down',
-                        'showactive': True,
-                        'x': 0.95,
-                        'y': 1.15,
-                        'xanchor': 'right',
-                        'yanchor': 'top'
-                    }
-                ]
+                margin=dict(t=60, b=40, l=40, r=40)
             )
 
             figure = go.Figure(data=[trace, trace_min, trace_max, trace_qty], layout=layout)
@@ -100,18 +75,6 @@ class GraphFactory:
         else:
             raise ValueError(f"Graph type '{graph_type}' not supported.")
 
-# Data cleaning utility
-def clean_data(value):
-    if isinstance(value, str):
-        value = value.replace(',', '.')
-        if value.count('.') > 1:
-            value = value.replace('.', '', value.count('.') - 1)
-        try:
-            return float(value)
-        except ValueError:
-            return np.nan
-    return value
-
 # API Routes
 
 class PredictionHandler:
@@ -142,6 +105,10 @@ class PredictionHandler:
         except Exception as e:
             return jsonify({"error": str(e)}), 400
 
+# Cached frames of symbols that an ingest (here or in another process) has just written are dropped right away
+EventBus().subscribe("frame_cache", FrameCache().on_bars_written)
+start_listener()
+
 @app.route("/", methods=["GET"])
 def read_root():
     return render_template("login.html")
@@ -168,6 +135,10 @@ def most_liquid():
    data = most_liquid_stocks()
    return jsonify(data)
 
+@app.route('/frame_cache/stats', methods=['GET'])
+def frame_cache_stats():
+    return jsonify(FrameCache().stats())
+
 @app.route('/update_news', methods=['POST'])
 def update_news_api():
     try:
@@ -188,19 +159,47 @@ def sentiment(company_code):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def chart_date(value):
+    # A malformed from/to is ignored like an unknown range, instead of failing the page
+    if not value:
+        return None
+    try:
+        return schema.to_date(value)
+    except ValueError:
+        return None
+
+def chart_window(stock_code, range_key, start=None, end=None):
+    # Ranges count back from the symbol's last bar, so dormant listings still show their last trades
+    if start and end and start > end:
+        # from/to given the wrong way round still name the same period
+        start, end = end, start
+    if start or end:
+        return start, end
+    days = CHART_RANGES[range_key][1]
+    if days is None:
+        return None, None
+    last_bar = MongoRepository().last_bar(stock_code)
+    if not last_bar:
+        return None, None
+    last_date = schema.to_date(last_bar['date'])
+    return last_date - pd.Timedelta(days=days), last_date
+
 @app.route('/company_info/<stock_code>', methods=['GET'])
 def company_info(stock_code):
-    trading_data = list(collection.find({"company_name": stock_code}))
-    if not trading_data:
+    range_key = request.args.get('range', DEFAULT_CHART_RANGE)
+    if range_key not in CHART_RANGES:
+        range_key = DEFAULT_CHART_RANGE
+    points = min(max(request.args.get('points', DEFAULT_CHART_POINTS, type=int), 3), MAX_CHART_POINTS)
+    start, end = chart_window(stock_code, range_key, chart_date(request.args.get('from')),
+                              chart_date(request.args.get('to')))
+
+    # Long ranges are read from the weekly/monthly rollups when daily bars would only be downsampled away
+    df = load_resolution(stock_code, start, end, points=points,
+                         fields=['last_trade_price', 'min_price', 'max_price', 'volume'])
+    if df.empty:
         flash("Company not found", "error")
         return render_template("index.html")
-    
-    df = pd.DataFrame(trading_data)
-    df['date'] = pd.to_datetime(df['date'], dayfirst=False)
-    df['last_trade_price'] = df['last_trade_price'].apply(clean_data)
-    df['min_price'] = df['min_price'].apply(clean_data)
-    df['max_price'] = df['max_price'].apply(clean_data)
-    df['volume'] = df['volume'].apply(clean_data)
+    df = downsample_bars(df, points)
     
     graph_html = GraphFactory.create_graph("trading", df, stock_code)
 
@@ -213,6 +212,9 @@ def company_info(stock_code):
         'company_info.html',
         company={'name': stock_code},
         graph_html=graph_html,
+        chart_ranges=[(key, label) for key, (label, _) in CHART_RANGES.items()],
+        selected_range=range_key,
+        points=points,
         analysis_data=analysis_data,
     )
 
@@ -0,0 +1,99 @@
+import os
+from typing import List, Optional
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+import schema
+import settings
+
+
+# Repository Pattern over MongoDB: the single owner of the pooled client in this process.
+# The web app, the predictors and the ingest pipeline all go through it instead of opening their own clients.
+class MongoRepository:
+    _instance = None
+
+    def __new__(cls):
+        # pymongo clients are not fork-safe, so a forked worker gets its own pool
+        if cls._instance is None or cls._instance.pid != os.getpid():
+            instance = super().__new__(cls)
+            instance.pid = os.getpid()
+            instance.client = MongoClient(
+                settings.MONGO_URI,
+                maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+                minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+                connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS
+            )
+            cls._instance = instance
+        return cls._instance
+
+    def database(self, db_name: str = None):
+        return self.client[db_name or settings.STOCKS_DB]
+
+    def collection(self, collection_name: str, db_name: str = None):
+        return self.database(db_name)[collection_name]
+
+    def bars_collection(self):
+        return self.collection(settings.STOCK_DATA_COLLECTION)
+
+    def bars(self, stock_code: str, start=None, end=None, fields: List[str] = None) -> List[dict]:
+        # Bars of one symbol in date order; start and end are inclusive dates, datetimes or "YYYY-MM-DD" strings
+        query = {"company_name": stock_code, **schema.date_range_filter(start, end)}
+        projection = {"_id": 0}
+        if fields:
+            projection.update({field: 1 for field in ["date", "schema_version"] + fields})
+        return list(self.bars_collection().find(query, projection).sort("date", ASCENDING))
+
+    def first_bar(self, stock_code: str) -> Optional[dict]:
+        return self.bars_collection().find_one({"company_name": stock_code}, {"_id": 0}, sort=[("date", ASCENDING)])
+
+    def last_bar(self, stock_code: str) -> Optional[dict]:
+        return self.bars_collection().find_one({"company_name": stock_code}, {"_id": 0}, sort=[("date", DESCENDING)])
+
+    def bulk_upsert(self, documents: List[dict], collection=None) -> int:
+        # Idempotent write keyed on the unique (company_name, date) index
+        if not documents:
+            return 0
+        collection = collection if collection is not None else self.bars_collection()
+        operations = [
+            UpdateOne({"company_name": document["company_name"], "date": document["date"]},
+                      {"$set": document}, upsert=True)
+            for document in documents
+        ]
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError:
+            # Two upserts racing on the same key raise E11000; the retry turns them into plain updates
+            collection.bulk_write(operations, ordered=False)
+        return len(documents)
+
+    def replace_bars(self, stock_code: str, documents: List[dict], collection=None) -> int:
+        # Time-series collections have no upserts, so the days of the batch are deleted and inserted again
+        if not documents:
+            return 0
+        collection = collection if collection is not None else self.bars_collection()
+        dates = [document["date"] for document in documents]
+        # Deleting on the timeField needs MongoDB 7.0+, which is where time-series deletes became general
+        collection.delete_many({"company_name": stock_code, "date": {"$in": dates}})
+        collection.insert_many(documents, ordered=False)
+        # The delete and the insert are not atomic: two writers on the same days (a lease taken over while the
+        # old owner still finishes, overlapping windows) can both insert. Every writer ends with this pass,
+        # and all of them keep the same bar per day, so the last one to finish leaves exactly one.
+        self.remove_duplicate_bars(stock_code, dates, collection)
+        return len(documents)
+
+    def remove_duplicate_bars(self, stock_code: str, dates: list, collection=None) -> int:
+        collection = collection if collection is not None else self.bars_collection()
+        pipeline = [
+            {"$match": {"company_name": stock_code, "date": {"$in": dates}}},
+            {"$group": {"_id": "$date", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        duplicates = []
+        for group in collection.aggregate(pipeline):
+            keep = max(group["ids"])
+            duplicates.extend(bar_id for bar_id in group["ids"] if bar_id != keep)
+        if not duplicates:
+            return 0
+        return collection.delete_many({"_id": {"$in": duplicates}}).deleted_count
@@ -0,0 +1,181 @@
+import argparse
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+from bar_loader import BarLoaderFactory
+from frame_cache import CachedBarLoader, DataVersions
+from repository import MongoRepository
+import schema
+
+# Materialized OHLCV rollups of the daily bars, one collection per resolution.
+# Document: {company_name, date (period start), open, high, low, close, volume, turnover, bars, last_date}
+# MSE bars have no opening price, so a period opens at the close of its first trading day.
+RESOLUTIONS = {
+    "1w": {"collection": "stock_data_weekly", "days": 7, "period": "W-SUN"},
+    "1M": {"collection": "stock_data_monthly", "days": 30, "period": "M"},
+    "1y": {"collection": "stock_data_yearly", "days": 365, "period": "Y"}
+}
+DAILY_FIELDS = ["last_trade_price", "max_price", "min_price", "volume", "turnover"]
+
+
+def period_start(resolution: str, day: datetime) -> datetime:
+    day = datetime(day.year, day.month, day.day)
+    if resolution == "1w":
+        return day - timedelta(days=day.weekday())
+    if resolution == "1M":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def period_end(resolution: str, day: datetime) -> datetime:
+    start = period_start(resolution, day)
+    if resolution == "1w":
+        return start + timedelta(days=6)
+    if resolution == "1M":
+        return (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start.replace(month=12, day=31)
+
+
+def rollup_frame(daily: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    periods = daily['date'].dt.to_period(RESOLUTIONS[resolution]["period"]).dt.start_time
+    grouped = daily.groupby(periods)
+    return pd.DataFrame({
+        "open": grouped['last_trade_price'].first(),
+        "high": grouped['max_price'].max(),
+        "low": grouped['min_price'].min(),
+        "close": grouped['last_trade_price'].last(),
+        "volume": grouped['volume'].sum(),
+        "turnover": grouped['turnover'].sum(),
+        "bars": grouped['date'].count(),
+        "last_date": grouped['date'].max()
+    }).rename_axis("date").reset_index()
+
+
+# Repository Pattern for the rollup collections
+class RollupStore:
+    # Rollups of one symbol are recomputed one at a time, so concurrent window flushes cannot overwrite
+    # a newer recomputation with an older one
+    _locks = defaultdict(threading.Lock)
+
+    def __init__(self, repository: MongoRepository = None):
+        self.repository = repository or MongoRepository()
+        self._indexed = False
+
+    def collection(self, resolution: str):
+        return self.repository.collection(RESOLUTIONS[resolution]["collection"])
+
+    def ensure_indexes(self):
+        if not self._indexed:
+            for resolution in RESOLUTIONS:
+                self.collection(resolution).create_index([("company_name", ASCENDING), ("date", ASCENDING)],
+                                                         unique=True, name="company_date_unique")
+            self._indexed = True
+
+    def update(self, stock_code: str, first_date, last_date) -> int:
+        # Only the periods touched by the new bars are recomputed; a week can reach into the neighbouring year
+        first_date, last_date = schema.to_date(first_date), schema.to_date(last_date)
+        load_start = min(period_start(resolution, first_date) for resolution in RESOLUTIONS)
+        load_end = max(period_end(resolution, last_date) for resolution in RESOLUTIONS)
+        self.ensure_indexes()
+        with self._locks[stock_code]:
+            daily = BarLoaderFactory.create_loader(self.repository).load(stock_code, load_start, load_end,
+                                                                          fields=DAILY_FIELDS)
+            if daily.empty:
+                return 0
+            updated = 0
+            for resolution in RESOLUTIONS:
+                # Periods after the one holding last_date may only be partly loaded, so they are left alone
+                start, end = period_start(resolution, first_date), period_end(resolution, last_date)
+                rollup = rollup_frame(daily[(daily['date'] >= start) & (daily['date'] <= end)], resolution)
+                updated += self._store(stock_code, resolution, rollup)
+            return updated
+
+    def on_bars_written(self, event):
+        self.update(event.stock_code, event.first_date, event.last_date)
+
+    def rebuild(self, stock_code: str) -> int:
+        first_bar = self.repository.first_bar(stock_code)
+        last_bar = self.repository.last_bar(stock_code)
+        if not first_bar:
+            return 0
+        for resolution in RESOLUTIONS:
+            self.collection(resolution).delete_many({"company_name": stock_code})
+        updated = self.update(stock_code, first_bar["date"], last_bar["date"])
+        DataVersions(self.repository).bump(stock_code)
+        return updated
+
+    def _store(self, stock_code: str, resolution: str, rollup: pd.DataFrame) -> int:
+        operations = []
+        for document in rollup.to_dict("records"):
+            document["date"] = document["date"].to_pydatetime()
+            document["last_date"] = document["last_date"].to_pydatetime()
+            document["company_name"] = stock_code
+            operations.append(UpdateOne({"company_name": stock_code, "date": document["date"]},
+                                        {"$set": document}, upsert=True))
+        if operations:
+            self.collection(resolution).bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def load(self, stock_code: str, resolution: str, start=None, end=None) -> pd.DataFrame:
+        # Returned with the daily column names, so charts and indicators take either without changes
+        query = {"company_name": stock_code}
+        if start is not None or end is not None:
+            query["date"] = {}
+            if start is not None:
+                query["date"]["$gte"] = period_start(resolution, schema.to_date(start))
+            if end is not None:
+                query["date"]["$lte"] = schema.to_date(end)
+        documents = list(self.collection(resolution).find(query, {"_id": 0}).sort("date", ASCENDING))
+        df = pd.DataFrame(documents, columns=["date", "open", "high", "low", "close", "volume", "turnover", "bars"])
+        df['date'] = pd.to_datetime(df['date'])
+        return df.rename(columns={"close": "last_trade_price", "high": "max_price", "low": "min_price"})
+
+
+def pick_resolution(resolution_days: float) -> Optional[str]:
+    # The coarsest rollup whose period still fits into the requested resolution; None means daily bars
+    fitting = [name for name, resolution in RESOLUTIONS.items() if resolution["days"] <= resolution_days]
+    return max(fitting, key=lambda name: RESOLUTIONS[name]["days"]) if fitting else None
+
+
+def load_resolution(stock_code: str, start=None, end=None, points: int = None,
+                    resolution_days: float = None, fields: List[str] = None) -> pd.DataFrame:
+    # Either a resolution in days, or a number of points over the range from which the resolution follows
+    repository = MongoRepository()
+    if resolution_days is None and points:
+        first = schema.to_date(start) if start is not None else None
+        last = schema.to_date(end) if end is not None else None
+        if first is None:
+            first_bar = repository.first_bar(stock_code)
+            first = schema.to_date(first_bar["date"]) if first_bar else None
+        if last is None:
+            last_bar = repository.last_bar(stock_code)
+            last = schema.to_date(last_bar["date"]) if last_bar else None
+        if first is not None and last is not None:
+            resolution_days = (last - first).days / points
+
+    resolution = pick_resolution(resolution_days) if resolution_days else None
+    if resolution is not None:
+        rollup = RollupStore(repository).load(stock_code, resolution, start, end)
+        if not rollup.empty:
+            return rollup
+    # Daily bars, also for symbols whose rollups have not been built yet
+    return CachedBarLoader(repository).load(stock_code, start, end, fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the weekly, monthly and yearly OHLCV rollups.")
+    parser.add_argument("stock_codes", nargs="*", help="Symbols to rebuild (default: every symbol with bars)")
+    args = parser.parse_args()
+
+    repository = MongoRepository()
+    stock_codes = args.stock_codes or sorted(repository.bars_collection().distinct("company_name"))
+    store = RollupStore(repository)
+    for stock_code in stock_codes:
+        print(f"{stock_code}: {store.rebuild(stock_code)} rollup periods")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+from datetime import datetime
+from typing import Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Versioned document schema for stocks_db.stock_data
+# v1 (no schema_version field): "YYYY-MM-DD" date strings, prices possibly stored as locale strings
+# v2: BSON datetime dates (midnight UTC), float prices, int volume
+SCHEMA_VERSION = 2
+PRICE_FIELDS = ["last_trade_price", "max_price", "min_price", "avg_price", "percent_change", "turnover",
+                "total_turnover"]
+
+
+def to_number(value) -> Optional[float]:
+    # Same rules the readers applied on every request: comma becomes a dot and only the last dot is kept
+    if value is None or isinstance(value, (int, float)):
+        return value
+    value = str(value).replace(',', '.')
+    value = value.replace('.', '', value.count('.') - 1)
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def to_date(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+
+
+def typed_fields(document: dict) -> dict:
+    fields = {"date": to_date(document["date"]), "schema_version": SCHEMA_VERSION}
+    for field in PRICE_FIELDS:
+        if field in document:
+            fields[field] = to_number(document[field])
+    if "volume" in document:
+        volume = to_number(document["volume"])
+        fields["volume"] = int(volume) if volume is not None else None
+    return fields
+
+
+def date_range_filter(start=None, end=None) -> dict:
+    # Matches both stored date types, so queries keep working while a migration is still running
+    typed, legacy = {}, {}
+    if start is not None:
+        typed["$gte"], legacy["$gte"] = to_date(start), to_date(start).strftime('%Y-%m-%d')
+    if end is not None:
+        typed["$lte"], legacy["$lte"] = to_date(end), to_date(end).strftime('%Y-%m-%d')
+    if not typed:
+        return {}
+    return {"$or": [{"date": typed}, {"date": legacy}]}
+
+
+def legacy_count(collection) -> int:
+    return collection.count_documents({"schema_version": {"$ne": SCHEMA_VERSION}})
+
+
+def migrate(collection, batch_size: int = 1000) -> int:
+    # Converts documents in place, in _id order and in batches; safe to interrupt and run again
+    # Documents without a usable date cannot be typed; they are left as they are and counted
+    from frame_cache import DataVersions
+    versions = DataVersions()
+    migrated = 0
+    skipped = 0
+    last_id = None
+    while True:
+        query = {"schema_version": {"$ne": SCHEMA_VERSION}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            if skipped:
+                print(f"Skipped {skipped} documents without a valid date.")
+            return migrated
+        last_id = batch[-1]["_id"]
+
+        typed = []
+        for document in batch:
+            try:
+                typed.append((document["_id"], typed_fields(document), document.get("company_name")))
+            except (KeyError, ValueError):
+                skipped += 1
+        if not typed:
+            continue
+
+        operations = [UpdateOne({"_id": _id}, {"$set": fields}) for _id, fields, _ in typed]
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # A v2 bar for the same day was already written by ingest; the legacy copy is the stale one
+            duplicates = [typed[error["index"]][0] for error in e.details["writeErrors"] if error["code"] == 11000]
+            if len(duplicates) < len(e.details["writeErrors"]):
+                raise
+            collection.delete_many({"_id": {"$in": duplicates}})
+            print(f"Removed {len(duplicates)} legacy documents that duplicated typed bars.")
+        migrated += len(typed)
+        versions.bump_all(stock_code for _, _, stock_code in typed if stock_code)
+        print(f"Migrated {migrated} documents to schema v{SCHEMA_VERSION}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Migrate stock_data documents to schema v{SCHEMA_VERSION}.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the documents that need migrating")
+    args = parser.parse_args()
+
+    from repository import MongoRepository
+    collection = MongoRepository().bars_collection()
+    print(f"{legacy_count(collection)} documents are not on schema v{SCHEMA_VERSION}.")
+    if not args.dry_run:
+        migrate(collection, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
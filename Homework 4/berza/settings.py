@@ -0,0 +1,63 @@
+import os
+from datetime import datetime
+
+# Runtime configuration shared by the web app and the ingest pipeline, overridable through environment variables
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://mongo:27017/")
+STOCKS_DB = os.environ.get("STOCKS_DB", "stocks_db")
+
+# One pooled MongoClient per process (repository.MongoRepository) is tuned here
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "120000"))
+
+# collection: plain stock_data collection with a unique (company_name, date) index
+# timeseries: MongoDB time-series collection (metaField company_name, timeField date), see Filters/timeseries.py
+STOCK_DATA_BACKEND = os.environ.get("STOCK_DATA_BACKEND", "collection")
+STOCK_DATA_COLLECTION = os.environ.get(
+    "STOCK_DATA_COLLECTION", "stock_bars" if STOCK_DATA_BACKEND == "timeseries" else "stock_data"
+)
+
+# Local memory-mapped copy of the daily bars (column_store.py), written by the ingest path.
+# Readers refresh a symbol from Mongo once its copy is older than COLUMN_STORE_MAX_AGE seconds, which only matters
+# when the ingest runs on another host than the web app.
+COLUMN_STORE_ENABLED = os.environ.get("COLUMN_STORE_ENABLED", "1") == "1"
+COLUMN_STORE_DIR = os.environ.get("COLUMN_STORE_DIR", "cache/columns")
+COLUMN_STORE_MAX_AGE = int(os.environ.get("COLUMN_STORE_MAX_AGE", "3600"))
+
+# Per-symbol data versions bumped by the ingest path; the in-process bar frame cache (frame_cache.py) is keyed on them
+DATA_VERSIONS_COLLECTION = os.environ.get("DATA_VERSIONS_COLLECTION", "data_versions")
+FRAME_CACHE_MAX_BYTES = int(os.environ.get("FRAME_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Ingest events (events.py): a capped collection that other processes tail for (symbol, last_date, rows) notices
+EVENTS_COLLECTION = os.environ.get("EVENTS_COLLECTION", "ingest_events")
+EVENTS_CAPPED_BYTES = int(os.environ.get("EVENTS_CAPPED_BYTES", str(16 * 1024 * 1024)))
+EVENTS_LISTEN = os.environ.get("EVENTS_LISTEN", "1") == "1"
+
+# Per-symbol indicator state for analyze_stock (Predictors/indicator_state.py), advanced by the ingest events
+INDICATOR_STATE_COLLECTION = os.environ.get("INDICATOR_STATE_COLLECTION", "indicator_state")
+
+MSE_BASE_URL = os.environ.get("MSE_BASE_URL", "https://www.mse.mk")
+SEINET_API_URL = os.environ.get("SEINET_API_URL", "https://api.seinet.com.mk/public")
+
+MSE_EXTRA_HOLIDAYS = [day for day in os.environ.get("MSE_EXTRA_HOLIDAYS", "").split(",") if day]
+
+# online: serve immutable entries from disk and revalidate the rest, record: like online but keep every response
+# (POSTs included) for a later replay, replay: serve only from disk, off: bypass
+HTTP_CACHE_MODE = os.environ.get("HTTP_CACHE_MODE", "online")
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", "cache/http")
+# Outside record/replay, entries that are not immutable are pruned after this age, and the oldest of them go
+# first when the cache is over its size
+HTTP_CACHE_MAX_AGE_DAYS = float(os.environ.get("HTTP_CACHE_MAX_AGE_DAYS", "7"))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+def as_of_date() -> datetime:
+    # Pinning INGEST_AS_OF keeps the planned history windows, and so the cache keys, identical between runs
+    as_of = os.environ.get("INGEST_AS_OF")
+    if as_of:
+        return datetime.strptime(as_of, '%Y-%m-%d')
+    return datetime.now()
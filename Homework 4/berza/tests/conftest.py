@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The shared modules live in the project root, the ingest modules import each other from Filters
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "Filters"))
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import settings
+from column_store import ColumnStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # A fresh singleton over an empty directory
+    monkeypatch.setattr(settings, "COLUMN_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(ColumnStore, "_instance", None)
+    return ColumnStore()
+
+
+def bars(days, price: float = 1.0):
+    dates = np.array(days, dtype="datetime64[D]")
+    return dates, {"last_trade_price": np.full(len(dates), price), "volume": np.arange(len(dates)) + 1}
+
+
+def stored(store, stock_code="ALK"):
+    columns = store.open(stock_code)
+    return np.datetime_as_string(columns.dates, unit="D").tolist(), columns["last_trade_price"].tolist()
+
+
+def test_newer_bars_are_appended(store):
+    store.write("ALK", *bars(["2024-01-02", "2024-01-03"]), version=1)
+    store.write("ALK", *bars(["2024-01-04", "2024-01-05"], 2.0), version=2)
+    meta = store.read_meta("ALK")
+    assert meta["generation"] == 0 and meta["rows"] == 4 and meta["version"] == 2
+    assert stored(store) == (["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"], [1.0, 1.0, 2.0, 2.0])
+
+
+def test_refetched_last_day_is_overwritten_in_place(store):
+    store.write("ALK", *bars(["2024-01-02", "2024-01-03"]))
+    store.write("ALK", *bars(["2024-01-03", "2024-01-04"], 3.0))
+    assert store.read_meta("ALK")["generation"] == 0
+    assert stored(store) == (["2024-01-02", "2024-01-03", "2024-01-04"], [1.0, 3.0, 3.0])
+
+
+def test_older_bars_rewrite_into_the_next_generation(store):
+    store.write("ALK", *bars(["2024-01-03", "2024-01-05"]))
+    reader = store.open("ALK")
+    store.write("ALK", *bars(["2024-01-02", "2024-01-03"], 4.0))
+    meta = store.read_meta("ALK")
+    assert meta["generation"] == 1 and meta["rows"] == 3
+    # The corrected bar wins over the stored one
+    assert stored(store) == (["2024-01-02", "2024-01-03", "2024-01-05"], [4.0, 4.0, 1.0])
+    # A reader of the previous generation still sees its rows
+    assert len(reader) == 2 and reader["last_trade_price"].tolist() == [1.0, 1.0]
+
+
+def test_version_only_moves_forward(store):
+    store.write("ALK", *bars(["2024-01-02"]), version=5)
+    store.write("ALK", *bars(["2024-01-03"]), version=3)
+    assert store.read_meta("ALK")["version"] == 5
+
+
+def test_missing_columns_and_unsafe_symbols(store):
+    store.write("ALK", *bars(["2024-01-02"]))
+    assert np.isnan(store.open("ALK")["max_price"]).all()
+    assert store.write("../ALK", *bars(["2024-01-02"])) == 0
+    assert store.open("../ALK") is None and store.open("KMB") is None
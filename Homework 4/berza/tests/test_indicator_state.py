@@ -0,0 +1,91 @@
+import math
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from Predictors.indicator_state import ANALYSIS_DAYS, IndicatorState
+from Predictors.indicators import compute_indicators
+
+
+def history(length: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    dates = [datetime(2019, 1, 1) + timedelta(days=int(day)) for day in np.cumsum(rng.integers(1, 4, length))]
+    close = 100 + np.cumsum(rng.normal(0, 1, length))
+    close[rng.random(length) < 0.05] = np.nan
+    close[300:340] = np.nan
+    return dates, close, close - 1, close + 1
+
+
+def assert_matches_window(state: IndicatorState, dates, close, low, high, end: datetime):
+    # The state narrowed to analyze_stock's window against the kernels over that window's bars only
+    start = end - timedelta(days=ANALYSIS_DAYS)
+    if state.window_start(start) is None:
+        return False
+    window = [index for index, date in enumerate(dates) if start <= date <= state.last_date]
+    expected = compute_indicators(close[window], low[window], high[window], latest_only=True)
+    ema = state.ema.value if state.ema.value is not None else math.nan
+    for name, value in [("EMA", ema), ("MACD", state.macd()), ("SMA", state.closes.mean()), ("RSI", state.rsi()),
+                        ("STOCH_K", state.stoch_k.values[-1])]:
+        np.testing.assert_allclose(value, expected[name][-1], rtol=1e-9, atol=1e-9, err_msg=name)
+    return True
+
+
+def test_incremental_state_matches_the_window_batch():
+    dates, close, low, high = history(1500)
+    rows = list(zip(dates, close, low, high))
+    state = IndicatorState("ALK")
+    checked = 0
+    for index in range(0, len(rows), 7):
+        state.advance(rows[index:index + 7])
+        # Every check goes through the persisted document, like the store does
+        persisted = IndicatorState("ALK", state.to_document())
+        for days_later in (0, 45):
+            checked += assert_matches_window(IndicatorState("ALK", state.to_document()),
+                                             dates, close, low, high, state.last_date + timedelta(days=days_later))
+        state = persisted
+    assert checked > 300
+
+
+def test_incremental_state_equals_a_rebuild():
+    dates, close, low, high = history(900, seed=5)
+    rows = list(zip(dates, close, low, high))
+    incremental = IndicatorState("ALK")
+    for row in rows:
+        incremental.advance([row])
+    rebuilt = IndicatorState("ALK")
+    rebuilt.advance(rows)
+    assert list(incremental.dates) == list(rebuilt.dates)
+    assert incremental.ema.value == pytest.approx(rebuilt.ema.value, rel=1e-12)
+    assert incremental.macd() == pytest.approx(rebuilt.macd(), abs=1e-12)
+
+
+def test_replaced_last_bar_matches_a_state_built_with_it():
+    dates, close, low, high = history(800, seed=9)
+    rows = list(zip(dates, close, low, high))
+    corrected = (dates[-1], close[-2] + 3.0, low[-1], high[-1] + 3.0)
+    state = IndicatorState("ALK")
+    state.advance(rows[:600])
+    state.advance(rows[600:])
+    replaced = IndicatorState("ALK", state.to_document()).before_last_state()
+    replaced.advance([corrected])
+
+    expected = IndicatorState("ALK")
+    expected.advance(rows[:-1] + [corrected])
+    assert list(replaced.dates) == list(expected.dates)
+    assert replaced.ema.value == pytest.approx(expected.ema.value, rel=1e-12)
+    assert replaced.last_close == expected.last_close
+
+
+def test_window_of_only_nan_closes_has_no_ema():
+    start = datetime(2020, 1, 1)
+    state = IndicatorState("ALK")
+    state.advance([(start + timedelta(days=day), 100.0 + day, 99.0, 101.0) for day in range(10)])
+    state.advance([(start + timedelta(days=900 + day), math.nan, math.nan, math.nan) for day in range(40)])
+    assert state.ema.value is None and math.isnan(state.macd())
+
+
+def test_short_window_after_the_first_bar_is_left_to_the_history():
+    start = datetime(2020, 1, 1)
+    state = IndicatorState("ALK")
+    state.advance([(start + timedelta(days=day), 100.0 + day, 99.0, 101.0) for day in range(50)])
+    # Only 20 bars inside the window: the rolling indicators of the state still see the older ones
+    assert state.window_start(start + timedelta(days=30)) is None
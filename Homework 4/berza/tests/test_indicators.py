@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Predictors.bench_indicators import check_equal
+from Predictors.indicators import EMA_BLOCK, ema, macd, rolling_mean
+
+
+def bars(length: int, seed: int = 7, nan_share: float = 0.0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, length))
+    close[rng.random(length) < nan_share] = np.nan
+    spread = rng.uniform(0.1, 2.0, length)
+    return pd.DataFrame({"last_trade_price": close, "min_price": close - spread, "max_price": close + spread},
+                        index=pd.date_range("2022-01-03", periods=length, freq="B"))
+
+
+@pytest.mark.parametrize("length", [1, 2, 13, 30, EMA_BLOCK, EMA_BLOCK + 1, 520])
+def test_engine_matches_pandas_baseline(length):
+    check_equal(bars(length))
+
+
+@pytest.mark.parametrize("nan_share", [0.05, 0.3])
+def test_engine_matches_pandas_baseline_with_nan_closes(nan_share):
+    frame = bars(400, nan_share=nan_share)
+    frame.iloc[:3, 0] = np.nan
+    frame.iloc[100:140, 0] = np.nan
+    check_equal(frame)
+
+
+@pytest.mark.parametrize("span", [9, 12, 26, 30])
+def test_ema_matches_ewm(span):
+    close = bars(1000, seed=span, nan_share=0.1)["last_trade_price"]
+    expected = close.ewm(span=span, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(ema(close.to_numpy(), span), expected, rtol=1e-12)
+
+
+def test_ema_of_only_nans_stays_nan():
+    assert np.isnan(ema(np.full(5, np.nan), 12)).all()
+
+
+def test_macd_and_rolling_mean_match_pandas():
+    close = bars(300, seed=3)["last_trade_price"]
+    line, signal = macd(close.to_numpy())
+    expected = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    # A difference of two EMAs near 100: compared in absolute terms
+    np.testing.assert_allclose(line, expected.to_numpy(), rtol=0, atol=1e-10)
+    np.testing.assert_allclose(signal, expected.ewm(span=9, adjust=False).mean().to_numpy(), rtol=0, atol=1e-10)
+    np.testing.assert_allclose(rolling_mean(close.to_numpy(), 30), close.rolling(30).mean().to_numpy(),
+                               rtol=1e-12)
@@ -0,0 +1,53 @@
+from datetime import date, datetime, timedelta
+import pytest
+from Filter3 import StockDataFetcher
+from gaps import plan_backfill
+
+
+@pytest.mark.parametrize("window_days", [30, 60, 90, 120, 180, 365])
+def test_plan_windows_covers_the_range_with_calendar_periods(window_days):
+    start, end = datetime(2019, 3, 17), datetime(2024, 8, 9)
+    windows = StockDataFetcher.plan_windows(start, end, window_days)
+    months = StockDataFetcher.window_months(window_days)
+
+    # Newest first, contiguous, clipped to the range
+    assert windows[0][1] == end and windows[-1][0] == start
+    for (newer_start, _), (_, older_end) in zip(windows, windows[1:]):
+        assert older_end == newer_start - timedelta(days=1)
+    # Every inner window is one whole period, so it keeps its dates when the end date moves
+    for window_start, window_end in windows[1:-1]:
+        assert window_start.day == 1 and (window_start.month - 1) % months == 0
+        assert (window_end + timedelta(days=1)).day == 1
+    assert StockDataFetcher.plan_windows(start, end + timedelta(days=3), window_days)[1:] == windows[1:]
+
+
+def test_plan_windows_of_one_day():
+    day = datetime(2024, 2, 29)
+    assert StockDataFetcher.plan_windows(day, day, 365) == [(day, day)]
+
+
+def test_uncovered_ranges():
+    covered = [(datetime(2024, 1, 10), datetime(2024, 1, 20)), (datetime(2024, 1, 15), datetime(2024, 2, 5))]
+    assert StockDataFetcher.uncovered_ranges(datetime(2024, 1, 1), datetime(2024, 2, 10), covered) == [
+        (datetime(2024, 1, 1), datetime(2024, 1, 9)), (datetime(2024, 2, 6), datetime(2024, 2, 10))]
+
+
+@pytest.mark.parametrize("window_days", [30, 90, 365])
+def test_plan_backfill_windows_are_single_requests(window_days):
+    missing = [date(2022, 12, 30), date(2023, 1, 3), date(2023, 1, 4), date(2023, 3, 31), date(2023, 4, 3),
+               date(2023, 11, 15), date(2024, 6, 3)]
+    windows = plan_backfill(missing, window_days)
+
+    # Each window is narrowed to its gap days and lies inside one period that plan_windows would request
+    covered = [day for day in missing if any(start <= day <= end for start, end in windows)]
+    assert covered == missing
+    for start, end in windows:
+        assert start in missing and end in missing
+        requests = StockDataFetcher.plan_windows(datetime.combine(start, datetime.min.time()),
+                                                 datetime.combine(end, datetime.min.time()), window_days)
+        assert len(requests) == 1
+    assert windows == sorted(windows)
+
+
+def test_plan_backfill_without_gaps():
+    assert plan_backfill([], 365) == []
@@ -0,0 +1,48 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from Filter3 import StockDataFetcher
+from row_batches import FIELDS, RowBatch
+
+
+@pytest.fixture
+def fetcher():
+    return StockDataFetcher("http://127.0.0.1")
+
+
+def cells(date, price="1,234.50", volume="1,200"):
+    return [date, price, "1,250.00", "1,200.1.5", "", "-0.35", volume, "1.481.400", "2,962,800"]
+
+
+def test_row_batch_matches_process_row(fetcher):
+    rows = [cells("1/5/2024"), cells("12/31/2023", "17"), cells("2/29/2024", "3.5", "0"), cells("3/1/2024", "x.y")]
+    expected = [row for row in (fetcher.process_row(row, "ALK") for row in rows) if row is not None]
+    documents = RowBatch.from_cells(rows, "ALK").to_documents()
+
+    assert len(documents) == len(expected) == 3
+    for document, row in zip(documents, expected):
+        assert document == row
+        assert type(document["volume"]) is int and all(type(document[field]) is float
+                                                        for field in FIELDS if field != "volume")
+
+
+def test_row_batch_skips_the_rows_process_row_rejects(fetcher):
+    bad_dates = [cells("2/30/2024"), cells("13/1/2024"), cells("1/2"), cells("a/b/c")]
+    for row in bad_dates:
+        with pytest.raises(ValueError):
+            fetcher.process_row(row, "ALK")
+    assert fetcher.process_row(cells("1/6/2024")[:8], "ALK") is None
+
+    batch = RowBatch.from_cells([cells("1/5/2024"), cells("1/6/2024")[:8], *bad_dates, cells("1/8/2024")], "ALK")
+    assert batch.date_strings().tolist() == ["2024-01-05", "2024-01-08"]
+    assert all(len(column) == 2 for column in batch.columns.values())
+
+
+def test_concat_sorts_by_date():
+    newer = RowBatch.from_cells([cells("2/1/2024", "2")], "ALK")
+    older = RowBatch.from_cells([cells("1/1/2024", "1")], "ALK")
+    batch = RowBatch.concat("ALK", [newer, RowBatch.empty("ALK"), older])
+    assert batch.first_date() == "2024-01-01" and batch.last_date() == "2024-02-01"
+    assert batch.columns["last_trade_price"].tolist() == [1.0, 2.0]
+    assert batch.to_documents()[0]["date"] == datetime(2024, 1, 1)
+